@@ -2,10 +2,14 @@
 """
 Area-based connection system for exchange students
 """
-import pandas as pd
+import os
+import sys
 from fuzzywuzzy import fuzz
 from sample_data_extended import all_outgoing_students
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataset_registry import registry
+
 class AreaConnectionSystem:
     """
     A system to connect exchange students going to the same geographical area
@@ -14,7 +18,7 @@ class AreaConnectionSystem:
     def __init__(self):
         """Initialize the area connection system with sample data"""
         self.outgoing_students = all_outgoing_students
-        self.outgoing_df = pd.DataFrame(self.outgoing_students)
+        self.outgoing_df = registry.frame('all_outgoing_students', self.outgoing_students)
     
     def find_area_connections(self, student_id):
         """
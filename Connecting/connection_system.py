@@ -2,12 +2,16 @@
 """
 Connection System for Exchange Program Students
 """
-import pandas as pd
 import numpy as np
 from fuzzywuzzy import fuzz
 import json
+import os
+import sys
 from sample_data import outgoing_students, incoming_students, alumni, past_exchange_students
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataset_registry import registry
+
 class ConnectionSystem:
     """
     A system to connect exchange students with relevant contacts
@@ -20,11 +24,11 @@ class ConnectionSystem:
         self.alumni = alumni
         self.past_exchange_students = past_exchange_students
         
-        # Convert to pandas DataFrames for easier manipulation
-        self.outgoing_df = pd.DataFrame(self.outgoing_students)
-        self.incoming_df = pd.DataFrame(self.incoming_students)
-        self.alumni_df = pd.DataFrame(self.alumni)
-        self.past_exchange_df = pd.DataFrame(self.past_exchange_students)
+        # Convert to pandas DataFrames for easier manipulation (built once per process)
+        self.outgoing_df = registry.frame('outgoing_students', self.outgoing_students)
+        self.incoming_df = registry.frame('incoming_students', self.incoming_students)
+        self.alumni_df = registry.frame('alumni', self.alumni)
+        self.past_exchange_df = registry.frame('past_exchange_students', self.past_exchange_students)
     
     def find_exchange_partner(self, student_id):
         """
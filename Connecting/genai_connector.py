@@ -3,6 +3,8 @@ import sys
 import json
 import re
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'GenAI_Version'))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataset_registry import registry
 
 try:
     from watsonx_official_matcher import WatsonXOfficialMatcher
@@ -43,12 +45,18 @@ class GenAIConnector:
                     print(f"Warning: University requirements file not found at {university_requirements_path}")
                     university_requirements_path = ''
                 
-                # Initialize with valid file paths
-                self.model = WatsonXOfficialMatcher(
-                    student_data_path=student_data_path,
-                    university_requirements_path=university_requirements_path,
-                    api_key=self.api_key,
-                    project_id=self.project_id
+                # Initialize with valid file paths; connectors with the same
+                # credentials share one matcher per process
+                self.model = registry.get(
+                    ('WatsonXOfficialMatcher', student_data_path, university_requirements_path,
+                     self.api_key, self.project_id),
+                    lambda: WatsonXOfficialMatcher(
+                        student_data_path=student_data_path,
+                        university_requirements_path=university_requirements_path,
+                        api_key=self.api_key,
+                        project_id=self.project_id
+                    ),
+                    [student_data_path, university_requirements_path]
                 )
                 print("WatsonX model initialized successfully for connection enhancement")
             except Exception as e:
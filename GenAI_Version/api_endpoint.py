@@ -1,19 +1,64 @@
 import sys
+import os
 import json
-import pandas as pd
-from matcher_sdk import MatcherSDK
+import argparse
+import socketserver
+import stat
+from contextlib import redirect_stdout
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from dataset_registry import registry
+
+# stdout carries only the JSON output: import and progress messages of the matchers go to stderr
+with redirect_stdout(sys.stderr):
+    try:
+        from matcher_sdk import MatcherSDK
+    except ImportError:
+        try:
+            # The official SDK matcher, with the same evaluate_new_student interface
+            from official_matcher import WatsonXOfficialMatcher as MatcherSDK
+        except ImportError:
+            print("Matcher SDK not available. Using simulated rankings.")
+            MatcherSDK = None
+
+# Data files, relative to GenAI_Version where this script is run
+STUDENT_DATA_PATH = '../exchange_program_dataset_updated.csv'
+UNIVERSITY_REQUIREMENTS_PATH = '../university_requirements.csv'
+
+def load_university_requirements():
+    """Shared catalog of the university requirements, or None if it cannot be loaded"""
+    try:
+        return registry.catalog(UNIVERSITY_REQUIREMENTS_PATH)
+    except Exception as e:
+        print(f"Error loading university requirements: {e}", file=sys.stderr)
+        return None
+
+def create_matcher():
+    """Build the matcher, or None if it is not available"""
+    if MatcherSDK is None:
+        return None
+    try:
+        return MatcherSDK(
+            student_data_path=STUDENT_DATA_PATH,
+            university_requirements_path=UNIVERSITY_REQUIREMENTS_PATH
+        )
+    except Exception as e:
+        print(f"Error initializing matcher: {e}", file=sys.stderr)
+        return None
+
+def get_matcher():
+    """Matcher shared by every request of the process, rebuilt when a data file changes"""
+    return registry.get(
+        ('api_endpoint_matcher', STUDENT_DATA_PATH, UNIVERSITY_REQUIREMENTS_PATH),
+        create_matcher,
+        [STUDENT_DATA_PATH, UNIVERSITY_REQUIREMENTS_PATH]
+    )
 
 def generate_simulated_rankings(student_data):
     """Generate simulated rankings using real university requirements data"""
     print("Generating simulated rankings with real university data", file=sys.stderr)
     
-    # Load university requirements data
-    try:
-        uni_requirements = pd.read_csv('../university_requirements.csv')
-        print(f"Loaded {len(uni_requirements)} university requirements", file=sys.stderr)
-    except Exception as e:
-        print(f"Error loading university requirements: {e}", file=sys.stderr)
-        uni_requirements = None
+    # Look up university requirements in the shared catalog (loaded once per process)
+    uni_requirements = load_university_requirements()
     
     # Extract universities from student data
     universities = student_data.get('Top 10', '').split(', ')
@@ -78,16 +123,14 @@ def generate_simulated_rankings(student_data):
     for i, uni_name in enumerate(universities):
         uni_req = None
         if uni_requirements is not None:
-            uni_req_rows = uni_requirements[uni_requirements['University Name'] == uni_name]
+            uni_req = uni_requirements.get(uni_name)
             
-            if uni_req_rows.empty:
-                for idx, row in uni_requirements.iterrows():
-                    if uni_name in row['University Name'] or row['University Name'] in uni_name:
-                        uni_req = row
-                        print(f"Found partial match: '{uni_name}' -> '{row['University Name']}'", file=sys.stderr)
+            if uni_req is None:
+                for name in uni_requirements:
+                    if uni_name in name or name in uni_name:
+                        uni_req = uni_requirements[name]
+                        print(f"Found partial match: '{uni_name}' -> '{name}'", file=sys.stderr)
                         break
-            else:
-                uni_req = uni_req_rows.iloc[0]
         min_gpa = float(uni_req['Min GPA']) if uni_req is not None else 3.5
         min_ielts = float(uni_req['Min IELTS']) if uni_req is not None else 6.5
         required_extracurriculars = int(uni_req['Required Extracurriculars']) if uni_req is not None else 3
@@ -185,11 +228,10 @@ def generate_simulated_rankings(student_data):
 def process_student_data(student_data):
     """Process student data and return university rankings"""
     try:
-        # Initialize the matcher
-        matcher = MatcherSDK(
-            student_data_path='../exchange_program_dataset_updated.csv',
-            university_requirements_path='../university_requirements.csv'
-        )
+        # Get the matcher, built once per process
+        matcher = get_matcher()
+        if matcher is None:
+            raise RuntimeError("Matcher not available")
         
         # Generate rankings
         rankings = matcher.evaluate_new_student(student_data)
@@ -214,23 +256,120 @@ def process_student_data(student_data):
         # Fallback to simulated rankings if there's an error
         return generate_simulated_rankings(student_data)
 
+def handle_request(line):
+    """
+    Answer one JSON-lines request
+    
+    Args:
+        line: Student data JSON, as passed on the command line in one-shot mode
+        
+    Returns:
+        response: Rankings JSON array, or a JSON object with an "error" message
+    """
+    try:
+        student_data = json.loads(line)
+        return json.dumps(process_student_data(student_data))
+    except json.JSONDecodeError as e:
+        message = f"Error parsing student data JSON: {e}"
+    except Exception as e:
+        message = f"Unexpected error: {e}"
+    print(message, file=sys.stderr)
+    return json.dumps({'error': message})
+
+def serve_stdio(input_stream, output_stream):
+    """Answer JSON-lines requests from input_stream until it is closed, one response line each"""
+    for line in input_stream:
+        if not line.strip():
+            continue
+        output_stream.write(handle_request(line) + '\n')
+        output_stream.flush()
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """Answer the JSON-lines requests of one socket connection"""
+    
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            self.wfile.write((handle_request(line.decode('utf-8')) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+class ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def is_socket(path):
+    """True if path is a Unix socket file (and not, e.g., a regular file)"""
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except OSError:
+        return False
+
+def serve_socket(socket_path):
+    """
+    Answer JSON-lines requests on a Unix socket, one thread per connection
+    
+    A stale socket left by an earlier worker is replaced; any other existing
+    file at socket_path is left alone and the worker refuses to start.
+    
+    Returns:
+        started: False if socket_path is taken by something that is not a socket
+    """
+    if os.path.lexists(socket_path):
+        if not is_socket(socket_path):
+            print(f"Error: {socket_path} exists and is not a socket", file=sys.stderr)
+            return False
+        os.remove(socket_path)
+    with ThreadingUnixServer(socket_path, RequestHandler) as server:
+        print(f"Listening on {socket_path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if is_socket(socket_path):
+                os.remove(socket_path)
+    return True
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Rank universities for a student, once or as a long-lived worker')
+    parser.add_argument('student_json', nargs='?', help='Student data JSON (one-shot mode)')
+    parser.add_argument('--serve', action='store_true',
+                        help='Answer JSON-lines requests from stdin on stdout, one student JSON per line')
+    parser.add_argument('--socket', metavar='PATH',
+                        help='Answer JSON-lines requests on a Unix socket at PATH')
+    args = parser.parse_args()
+    
+    # Keep the real stdout for the JSON output; everything else printed goes to stderr
+    output = sys.stdout
+    
+    if args.serve or args.socket:
+        with redirect_stdout(sys.stderr):
+            # Load the data and the matcher once, before the first request
+            load_university_requirements()
+            get_matcher()
+            if args.socket:
+                if not serve_socket(args.socket):
+                    sys.exit(1)
+            else:
+                serve_stdio(sys.stdin, output)
+        sys.exit(0)
+    
     # Get student data from command line argument
-    if len(sys.argv) < 2:
+    if args.student_json is None:
         print("Error: No student data provided", file=sys.stderr)
         sys.exit(1)
     
     try:
         # Parse student data from JSON string
-        student_data_json = sys.argv[1]
-        student_data = json.loads(student_data_json)
+        student_data = json.loads(args.student_json)
         
         # Process student data
-        rankings = process_student_data(student_data)
+        with redirect_stdout(sys.stderr):
+            rankings = process_student_data(student_data)
         
         # Output rankings as JSON - make sure to only print the JSON to stdout
         # and all other messages to stderr
-        print(json.dumps(rankings))
+        print(json.dumps(rankings), file=output)
     
     except json.JSONDecodeError as e:
         print(f"Error parsing student data JSON: {e}", file=sys.stderr)
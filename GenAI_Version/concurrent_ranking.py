@@ -0,0 +1,90 @@
+"""
+Concurrent per-university analysis for the GenAI matchers
+
+generate_ranking analyzes a student's Top 10 universities with one LLM
+request each. Running the requests concurrently makes a ranking take about
+one round-trip instead of ten; a deadline bounds the total wait. Results are
+yielded as they finish, so callers can stream them.
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Maximum number of concurrent LLM requests for one ranking
+MAX_CONCURRENCY = 10
+
+# Threads shared by the rankings of the whole process. An analysis abandoned
+# at the deadline keeps its thread until the LLM call returns, so this also
+# bounds how many calls to a hanging backend can pile up.
+MAX_WORKERS = 32
+
+# Seconds a ranking waits for its LLM analyses before falling back to traditional scoring
+RANKING_DEADLINE = 30.0
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def shared_executor():
+    """Thread pool shared by every ranking of the process, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='ranking')
+        return _executor
+
+
+def iter_analyses(analyze, fallback, universities, max_concurrency=MAX_CONCURRENCY,
+                  deadline=RANKING_DEADLINE):
+    """
+    Analyze several universities concurrently, yielding each result as soon as it is ready
+
+    The analyses run on the shared executor, at most max_concurrency of this
+    ranking at a time. At the deadline, analyses that have not started are
+    cancelled and running ones are abandoned.
+
+    Args:
+        analyze: Function taking a university record and returning (score, explanation)
+        fallback: Function with the same signature used for analyses that miss the deadline
+        universities: List of university requirement records
+        max_concurrency: Maximum number of analyses of this ranking running at once
+        deadline: Seconds to wait for all analyses (None for no deadline)
+
+    Yields:
+        (index, (score, explanation)): Index of the university in universities and
+            its result, in completion order; analyses that missed the deadline
+            come last, scored with fallback
+    """
+    if not universities:
+        return
+
+    executor = shared_executor()
+    end = None if deadline is None else time.monotonic() + deadline
+    waiting = iter(enumerate(universities))
+    futures = {}
+
+    def submit_next():
+        item = next(waiting, None)
+        if item is not None:
+            futures[executor.submit(analyze, item[1])] = item[0]
+
+    try:
+        for _ in range(max(1, max_concurrency)):
+            submit_next()
+        while futures:
+            timeout = None if end is None else max(0.0, end - time.monotonic())
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in sorted(done, key=futures.get):
+                i = futures.pop(future)
+                submit_next()
+                yield i, future.result()
+    finally:
+        # Queued analyses (also when the caller stops early) never start
+        for future in futures:
+            future.cancel()
+
+    for i in sorted(list(futures.values()) + [i for i, _ in waiting]):
+        print(f"No analysis for {universities[i]['University Name']} within {deadline}s. Using traditional scoring.")
+        yield i, fallback(universities[i])
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Batch runner for the GenAI matchers
+
+Scores every (student, university) pair of a cohort with WatsonX, keeping a
+bounded number of LLM requests in flight, rate limiting them with a token
+bucket and retrying failed requests with exponential backoff. Results are
+written through the same result sinks, summary and checkpoints as
+batch_processor.py.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from batch_checkpoint import CHECKPOINT_INTERVAL
+from batch_processor import run_info, save_summary, start_checkpointed_run
+from result_sinks import SINK_TYPES
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+STUDENT_DATA_PATH = os.path.join(BASE_DIR, 'exchange_program_dataset_updated.csv')
+UNIVERSITY_REQUIREMENTS_PATH = os.path.join(BASE_DIR, 'university_requirements.csv')
+
+MATCHER_TYPES = ['official', 'genai']
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` requests per second in bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum number of stored tokens (default: max(1, rate))
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_retryable(error):
+    """Retry throttling (429), server errors and errors without a status code (network, timeouts)"""
+    status_code = getattr(error, 'status_code', None)
+    return status_code is None or status_code == 429 or status_code >= 500
+
+
+def remote_analysis(matcher):
+    """
+    The matcher's raw LLM request method, or None if it has no model or credentials
+
+    The returned function takes (student_data, university_data) and raises on
+    errors instead of falling back to traditional scoring.
+    """
+    if getattr(matcher, 'model', None) is not None and hasattr(matcher, 'request_watsonx_analysis'):
+        return matcher.request_watsonx_analysis
+    if getattr(matcher, 'api_key', None) and hasattr(matcher, 'request_watson_analysis'):
+        return matcher.request_watson_analysis
+    return None
+
+
+class GenAIBatchRunner:
+    """
+    Scores many (student, university) pairs with a GenAI matcher concurrently.
+
+    At most max_in_flight requests run at once (one per pool thread), request
+    starts are limited by a token bucket, and failed requests are retried with
+    exponential backoff and jitter. A pair whose retries are exhausted falls
+    back to the matcher's traditional scoring, like analyze_with_watsonx does.
+    """
+
+    def __init__(self, matcher, max_in_flight=8, requests_per_second=4.0, burst=None,
+                 max_retries=3, base_delay=1.0, max_delay=30.0):
+        """
+        Args:
+            matcher: WatsonXOfficialMatcher or GenAIUniversityMatcher
+            max_in_flight: Maximum number of concurrent LLM requests
+            requests_per_second: Token bucket rate (None or 0 for no rate limit)
+            burst: Token bucket capacity (default: max(1, requests_per_second))
+            max_retries: Retries per pair after the first attempt
+            base_delay: Backoff delay in seconds before the first retry (doubled each retry)
+            max_delay: Maximum backoff delay in seconds
+        """
+        self.matcher = matcher
+        self.remote = remote_analysis(matcher)
+        self.max_in_flight = max_in_flight
+        self.rate_limiter = TokenBucket(requests_per_second, burst) if requests_per_second else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.stats = {'requests': 0, 'retries': 0, 'fallbacks': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, stat):
+        with self._stats_lock:
+            self.stats[stat] += 1
+
+    def analyze_pair(self, student_data, university_data, features=None):
+        """
+        Score one student/university pair with retries and backoff
+
+        Returns:
+            (score, explanation): Score between 0 and 1 and the explanation text
+        """
+        if self.remote is None:
+            return self.matcher.calculate_traditional_match(student_data, university_data, features)
+
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            self._count('requests')
+            try:
+                return self.remote(student_data, university_data)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    print(f"Error analyzing {student_data['First Name']} {student_data['Last Name']} / "
+                          f"{university_data['University Name']}: {e}. Using traditional scoring.")
+                    self._count('fallbacks')
+                    return self.matcher.calculate_traditional_match(student_data, university_data, features)
+
+                # Exponential backoff with jitter so throttled requests do not retry in lockstep
+                delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+                self._count('retries')
+                time.sleep(delay * random.uniform(0.5, 1.0))
+
+    def _submit_student(self, executor, student_data, features):
+        """Submit every pair of a student's Top 10; unknown universities get no request"""
+        pairs = []
+        for uni_name in student_data['Top 10'].split(', '):
+            uni_requirements = self.matcher.catalog.get(uni_name)
+            if uni_requirements is None:
+                pairs.append((uni_name, None))
+            else:
+                pairs.append((uni_name, executor.submit(self.analyze_pair, student_data, uni_requirements, features)))
+        return pairs
+
+    @staticmethod
+    def _collect_rankings(pairs):
+        """Wait for a student's pairs and build the rankings like generate_ranking"""
+        rankings = []
+        for uni_name, future in pairs:
+            if future is None:
+                # University not found in requirements database
+                rankings.append({
+                    'university': uni_name,
+                    'rank': 0,
+                    'explanation': "University requirements data not available."
+                })
+                continue
+
+            score, explanation = future.result()
+            rankings.append({
+                'university': uni_name,
+                'rank': round(score * 10),
+                'explanation': explanation
+            })
+
+        # Sort rankings by rank in descending order
+        return sorted(rankings, key=lambda x: x['rank'], reverse=True)
+
+    def rank_students(self, students, window=None):
+        """
+        Rank a stream of students, scoring pairs of several students concurrently
+
+        Args:
+            students: Iterable of (row, student_data, features)
+            window: Number of students with submitted requests ahead of the
+                one being yielded (default: max_in_flight)
+
+        Yields:
+            (row, student_data, rankings): In input order
+        """
+        window = window or max(1, self.max_in_flight)
+        with ThreadPoolExecutor(max_workers=max(1, self.max_in_flight)) as executor:
+            pending = deque()
+            for row, student_data, features in students:
+                pending.append((row, student_data, self._submit_student(executor, student_data, features)))
+                if len(pending) > window:
+                    row, student_data, pairs = pending.popleft()
+                    yield row, student_data, self._collect_rankings(pairs)
+
+            while pending:
+                row, student_data, pairs = pending.popleft()
+                yield row, student_data, self._collect_rankings(pairs)
+
+
+def create_matcher(matcher_type, student_data_path, university_requirements_path):
+    """Create the GenAI matcher of the given type ('official' or 'genai')"""
+    if matcher_type == 'official':
+        from official_matcher import WatsonXOfficialMatcher
+        return WatsonXOfficialMatcher(student_data_path, university_requirements_path)
+    if matcher_type == 'genai':
+        from genai_university_matcher import GenAIUniversityMatcher
+        return GenAIUniversityMatcher(student_data_path, university_requirements_path)
+    raise ValueError(f"Unknown matcher type: {matcher_type}")
+
+
+def run_genai_batch(output_dir="genai_results", matcher_type='official', sink_type='json', shards=0,
+                    max_in_flight=8, requests_per_second=4.0, max_retries=3, resume=False,
+                    checkpoint_interval=CHECKPOINT_INTERVAL, student_data_path=STUDENT_DATA_PATH,
+                    university_requirements_path=UNIVERSITY_REQUIREMENTS_PATH):
+    """
+    Rank every student with a GenAI matcher and write the results, summary and HTML report
+
+    Args:
+        output_dir: Directory for the results
+        matcher_type: 'official' (WatsonXOfficialMatcher) or 'genai' (GenAIUniversityMatcher)
+        sink_type: Result format, one of SINK_TYPES
+        shards: Spread per-student JSON reports over this many subdirectories
+        max_in_flight: Maximum number of concurrent LLM requests
+        requests_per_second: Rate limit for starting LLM requests
+        max_retries: Retries per pair before falling back to traditional scoring
+        resume: Continue from the checkpoint of an interrupted run
+        checkpoint_interval: Minimum number of seconds between checkpoint writes
+        student_data_path: Student CSV file
+        university_requirements_path: University requirements CSV file
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    matcher = create_matcher(matcher_type, student_data_path, university_requirements_path)
+    runner = GenAIBatchRunner(matcher, max_in_flight, requests_per_second, max_retries=max_retries)
+    if runner.remote is None:
+        print("No GenAI model or API key available. Using traditional scoring for every pair.")
+
+    checkpoint, sink = start_checkpointed_run(output_dir, matcher, sink_type, shards, resume, checkpoint_interval,
+                                              student_data_path=student_data_path, scorer=matcher_type)
+    students_df = matcher.students_df
+    table = checkpoint.table
+
+    students = (
+        (i, students_df.iloc[i].to_dict(), matcher.student_features.row(i))
+        for i in range(checkpoint.completed, len(students_df))
+    )
+
+    with sink:
+        for row, student_data, rankings in runner.rank_students(students):
+            sink.write(row, student_data, rankings)
+            table.add(student_data, rankings)
+            checkpoint.update(row + 1, table, sink)
+
+    summary = table.summary()
+
+    print(f"Processed {len(students_df)} students with {runner.stats['requests']} LLM requests "
+          f"({runner.stats['retries']} retries, {runner.stats['fallbacks']} fallbacks). "
+          f"Results saved to {output_dir}/")
+    save_summary(summary, matcher, output_dir,
+                 info=run_info(sink_type, shards, scorer=matcher_type, student_data_path=student_data_path))
+    checkpoint.remove()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate GenAI university rankings for every student in the dataset")
+    parser.add_argument('--matcher', choices=MATCHER_TYPES, default='official',
+                        help="GenAI matcher to use: the official WatsonX SDK matcher or the REST API matcher")
+    parser.add_argument('--output-dir', default='genai_results', help="Directory for the reports")
+    parser.add_argument('--sink', choices=SINK_TYPES, default='json', help="Result format")
+    parser.add_argument('--shards', type=int, default=0,
+                        help="Spread per-student JSON reports over this many subdirectories")
+    parser.add_argument('--max-in-flight', type=int, default=8, help="Maximum number of concurrent LLM requests")
+    parser.add_argument('--rate', type=float, default=4.0,
+                        help="Maximum number of LLM requests started per second (0 for no limit)")
+    parser.add_argument('--max-retries', type=int, default=3,
+                        help="Retries per request before falling back to traditional scoring")
+    parser.add_argument('--resume', action='store_true', help="Continue an interrupted run from its last checkpoint")
+    parser.add_argument('--checkpoint-interval', type=float, default=CHECKPOINT_INTERVAL,
+                        help="Minimum number of seconds between checkpoints")
+    args = parser.parse_args()
+
+    run_genai_batch(args.output_dir, matcher_type=args.matcher, sink_type=args.sink, shards=args.shards,
+                    max_in_flight=args.max_in_flight, requests_per_second=args.rate,
+                    max_retries=args.max_retries, resume=args.resume,
+                    checkpoint_interval=args.checkpoint_interval)
@@ -3,13 +3,37 @@ import numpy as np
 import re
 import json
 import os
+import sys
 from fuzzywuzzy import fuzz
 import requests
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from student_features import (
+    CourseVocabulary, StudentFeatureStore, extract_student_features, intern_catalog_courses,
+    parse_extracurriculars, parse_credit_transfers
+)
+from dataset_registry import registry
+from concurrent_ranking import MAX_CONCURRENCY, RANKING_DEADLINE, iter_analyses
+from pipeline_metrics import metrics
+
+class WatsonAPIError(Exception):
+    """Non-200 response from the Watson API"""
+    
+    def __init__(self, status_code, text):
+        super().__init__(f"Watson API error: {status_code} - {text}")
+        self.status_code = status_code
+
 
 class GenAIUniversityMatcher:
-    def __init__(self, student_data_path, university_requirements_path, api_key=None, api_url=None, project_id=None):
-        self.students_df = pd.read_csv(student_data_path)
-        self.universities_df = pd.read_csv(university_requirements_path)
+    def __init__(self, student_data_path, university_requirements_path, api_key=None, api_url=None, project_id=None,
+                 max_concurrency=MAX_CONCURRENCY, ranking_deadline=RANKING_DEADLINE):
+        self.max_concurrency = max_concurrency
+        self.ranking_deadline = ranking_deadline
+        self.students_df = registry.read_csv(student_data_path)
+        self.catalog = registry.catalog(university_requirements_path)
+        self.universities_df = self.catalog.universities_df.copy(deep=False)
+        self.course_vocabulary = CourseVocabulary()
+        intern_catalog_courses(self.universities_df, self.course_vocabulary)
+        self.student_features = StudentFeatureStore(self.students_df, self.course_vocabulary, intern=True)
         self.api_key = api_key or os.environ.get("WATSON_API_KEY")
         self.api_url = api_url or os.environ.get("WATSON_API_URL", "https://api.ibm.watsonx.ai/v1")
         self.project_id = project_id or os.environ.get("WATSON_PROJECT_ID")
@@ -22,65 +46,79 @@ class GenAIUniversityMatcher:
         }
     
     def parse_extracurriculars(self, extracurriculars_str):
-        if pd.isna(extracurriculars_str):
-            return []
-        
-        activities = extracurriculars_str.split('), ')
-        activities = [a.strip() for a in activities]
-        activities = [re.sub(r' -> \(.*$', '', a) for a in activities]
-        
-        if activities and activities[-1].endswith(')'):
-            activities[-1] = re.sub(r' -> \(.*\)$', '', activities[-1])
-            
-        return activities
+        return parse_extracurriculars(extracurriculars_str)
     
     def parse_credit_transfers(self, credit_transfer_str):
-        if pd.isna(credit_transfer_str):
-            return []
-            
-        courses = credit_transfer_str.split(', ')
-        courses = [c.strip() for c in courses]
-        return courses
+        return parse_credit_transfers(credit_transfer_str)
     
-    def analyze_with_watson(self, student_data, university_data):
+    def analyze_with_watson(self, student_data, university_data, features=None):
         if not self.api_key:
-            return self.calculate_traditional_match(student_data, university_data)
+            return self.calculate_traditional_match(student_data, university_data, features)
         
         try:
-            prompt = self._create_watson_prompt(student_data, university_data)
-            
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
-            payload = {
-                "model_id": "ibm/foundation-models/watsonx/granite-13b-chat-v2",
-                "input": prompt,
-                "parameters": {
-                    "temperature": 0.7,
-                    "max_new_tokens": 500,
-                    "repetition_penalty": 1.1
-                },
-                "project_id": self.project_id
-            }
-            
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                json=payload
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return self._parse_watson_response(result)
-            else:
-                print(f"Watson API error: {response.status_code} - {response.text}")
-                return self.calculate_traditional_match(student_data, university_data)
+            metrics.increment('llm_requests_total')
+            with metrics.stage('llm_call'):
+                return self.request_watson_analysis(student_data, university_data)
+        
+        except WatsonAPIError as e:
+            print(e)
+            metrics.increment('llm_errors_total')
+            return self.fallback_match(student_data, university_data, features, 'error')
                 
         except Exception as e:
             print(f"Error using Watson API: {e}")
-            return self.calculate_traditional_match(student_data, university_data)
+            metrics.increment('llm_errors_total')
+            return self.fallback_match(student_data, university_data, features, 'error')
+    
+    def traditional_match(self, student_data, university_data, features=None):
+        """Traditional scoring of a university, timed as the traditional_scoring stage"""
+        with metrics.stage('traditional_scoring'):
+            return self.calculate_traditional_match(student_data, university_data, features)
+    
+    def fallback_match(self, student_data, university_data, features=None, reason='error'):
+        """Traditional scoring in place of a failed ('error') or late ('deadline') Watson analysis"""
+        metrics.increment('llm_fallbacks_total', reason=reason)
+        with metrics.stage('fallback'):
+            return self.calculate_traditional_match(student_data, university_data, features)
+    
+    def request_watson_analysis(self, student_data, university_data):
+        """
+        Send one match analysis request to the Watson API, without the fallback
+        
+        Returns:
+            (score, explanation): Score between 0 and 1 and the explanation text
+            
+        Raises:
+            WatsonAPIError: If the API answers with a non-200 status
+        """
+        prompt = self._create_watson_prompt(student_data, university_data)
+        
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        
+        payload = {
+            "model_id": "ibm/foundation-models/watsonx/granite-13b-chat-v2",
+            "input": prompt,
+            "parameters": {
+                "temperature": 0.7,
+                "max_new_tokens": 500,
+                "repetition_penalty": 1.1
+            },
+            "project_id": self.project_id
+        }
+        
+        response = requests.post(
+            self.api_url,
+            headers=headers,
+            json=payload
+        )
+        
+        if response.status_code != 200:
+            raise WatsonAPIError(response.status_code, response.text)
+        
+        return self._parse_watson_response(response.json())
     
     def _create_watson_prompt(self, student, university):
         prompt = f"""
@@ -155,10 +193,13 @@ class GenAIUniversityMatcher:
             print(f"Error parsing Watson response: {e}")
             return 0.5, "Error in AI analysis. Using default score."
     
-    def calculate_traditional_match(self, student, university):
+    def calculate_traditional_match(self, student, university, features=None):
+        if features is None:
+            features = extract_student_features(student, self.course_vocabulary)
+        
         explanations = []
         gpa_score = 0
-        student_gpa = float(student['GPA'])
+        student_gpa = features.gpa
         min_gpa = float(university['Min GPA'])
         
         if student_gpa >= min_gpa:
@@ -177,7 +218,7 @@ class GenAIUniversityMatcher:
         
         # IELTS comparison
         ielts_score = 0
-        student_ielts = float(student['IELTS'])
+        student_ielts = features.ielts
         min_ielts = float(university['Min IELTS'])
         
         if student_ielts >= min_ielts:
@@ -196,42 +237,33 @@ class GenAIUniversityMatcher:
         
         # Extracurriculars comparison
         extracurriculars_score = 0
-        student_extracurriculars = self.parse_extracurriculars(student['Extra Co-Curriculars'])
+        num_extracurriculars = features.num_extracurriculars
         required_extracurriculars = int(university['Required Extracurriculars'])
         
-        if len(student_extracurriculars) >= required_extracurriculars:
-            extracurriculars_score = min(1.0, len(student_extracurriculars) / required_extracurriculars)
-            if len(student_extracurriculars) > required_extracurriculars + 1:
-                explanations.append(f"Your {len(student_extracurriculars)} extracurricular activities exceed the minimum requirement of {required_extracurriculars}.")
+        if num_extracurriculars >= required_extracurriculars:
+            extracurriculars_score = min(1.0, num_extracurriculars / required_extracurriculars)
+            if num_extracurriculars > required_extracurriculars + 1:
+                explanations.append(f"Your {num_extracurriculars} extracurricular activities exceed the minimum requirement of {required_extracurriculars}.")
             else:
-                explanations.append(f"Your {len(student_extracurriculars)} extracurricular activities meet the minimum requirement of {required_extracurriculars}.")
+                explanations.append(f"Your {num_extracurriculars} extracurricular activities meet the minimum requirement of {required_extracurriculars}.")
         else:
-            extracurriculars_score = max(0, 0.7 * (len(student_extracurriculars) / required_extracurriculars))
-            explanations.append(f"You have {len(student_extracurriculars)} extracurricular activities, which is below the minimum requirement of {required_extracurriculars}.")
+            extracurriculars_score = max(0, 0.7 * (num_extracurriculars / required_extracurriculars))
+            explanations.append(f"You have {num_extracurriculars} extracurricular activities, which is below the minimum requirement of {required_extracurriculars}.")
         
         # Credit transfer comparison
-        student_courses = self.parse_credit_transfers(student['Credit Transfer Requirement'])
-        
-        # Simple field detection
-        extracurriculars_text = student['Extra Co-Curriculars'].lower() if not pd.isna(student['Extra Co-Curriculars']) else ""
-        
-        if any(keyword in extracurriculars_text for keyword in ['engineering', 'robot', 'design', 'tech']):
-            field = 'Engineering Credit Transfer'
-        elif any(keyword in extracurriculars_text for keyword in ['science', 'biology', 'chemistry', 'physics', 'lab']):
-            field = 'Science Credit Transfer'
-        else:
-            field = 'Business Credit Transfer'
-        
-        university_courses = self.parse_credit_transfers(university[field])
+        # The field is determined by a simple keyword analysis of extracurriculars
+        field = features.field
         
         # Calculate overlap
-        if not student_courses or not university_courses:
+        if not features.has_courses:
             credit_transfer_score = 0
         else:
-            student_course_set = set(student_courses)
-            university_course_set = set(university_courses)
-            overlap = len(student_course_set.intersection(university_course_set))
-            credit_transfer_score = min(1.0, overlap / len(student_course_set)) if len(student_course_set) > 0 else 0
+            university_courses = self.course_vocabulary.intern_all(self.parse_credit_transfers(university[field]))
+            if not university_courses:
+                credit_transfer_score = 0
+            else:
+                overlap = len(set(features.course_ids).intersection(university_courses))
+                credit_transfer_score = min(1.0, overlap / len(features.course_ids))
         
         if credit_transfer_score > 0.8:
             explanations.append(f"Excellent credit transfer potential for your courses in the {field.split(' ')[0]} field.")
@@ -256,56 +288,86 @@ class GenAIUniversityMatcher:
         
         return weighted_score, " ".join(explanations)
     
-    def generate_ranking(self, student_index=None, student_data=None):
+    def iter_ranking(self, student_index=None, student_data=None):
         """
-        Generate university rankings for a student using GenAI
+        Rank a student's universities using GenAI, yielding each ranking as soon as it is ready
+        
+        The universities are analyzed concurrently, at most max_concurrency at a
+        time; analyses unfinished after ranking_deadline seconds fall back to
+        traditional scoring.
         
         Args:
             student_index: Index of the student in the dataframe (if using existing data)
             student_data: Dictionary containing student data (if providing new data)
             
-        Returns:
-            rankings: List of dictionaries with university rankings and explanations
+        Yields:
+            (position, ranking): Position of the university in the student's Top 10
+                and its ranking dictionary, in completion order
         """
         if student_data is None and student_index is not None:
             student_data = self.students_df.iloc[student_index].to_dict()
+            features = self.student_features.row(student_index)
         elif student_data is None:
             raise ValueError("Either student_index or student_data must be provided")
+        else:
+            features = extract_student_features(student_data, self.course_vocabulary)
         
         # Extract student's top 10 universities
         top_10_universities = student_data['Top 10'].split(', ')
         
-        rankings = []
-        
-        for uni_name in top_10_universities:
-            # Find the university in the requirements dataframe
-            uni_data = self.universities_df[self.universities_df['University Name'] == uni_name]
-            
-            if len(uni_data) == 0:
+        # Find the universities in the requirements catalog
+        with metrics.stage('catalog_lookup'):
+            uni_requirements = [self.catalog.get(uni_name) for uni_name in top_10_universities]
+        known_positions = []
+        for position, (uni_name, requirements) in enumerate(zip(top_10_universities, uni_requirements)):
+            if requirements is None:
                 # University not found in requirements database
-                rankings.append({
+                yield position, {
                     'university': uni_name,
                     'rank': 0,
                     'explanation': "University requirements data not available."
-                })
-                continue
-            
-            uni_requirements = uni_data.iloc[0].to_dict()
-            
-            # Use GenAI to analyze the match
-            score, explanation = self.analyze_with_watson(student_data, uni_requirements)
+                }
+            else:
+                known_positions.append(position)
+        
+        # Use GenAI to analyze the matches, all universities at once
+        known_universities = [uni_requirements[position] for position in known_positions]
+        if self.api_key:
+            results = iter_analyses(
+                lambda university: self.analyze_with_watson(student_data, university, features),
+                lambda university: self.fallback_match(student_data, university, features, 'deadline'),
+                known_universities, self.max_concurrency, self.ranking_deadline
+            )
+        else:
+            results = (
+                (i, self.traditional_match(student_data, university, features))
+                for i, university in enumerate(known_universities)
+            )
+        
+        for i, (score, explanation) in results:
+            position = known_positions[i]
             
             # Convert score to 0-10 scale and round to nearest integer
-            rank = round(score * 10)
-            
-            rankings.append({
-                'university': uni_name,
-                'rank': rank,
+            yield position, {
+                'university': top_10_universities[position],
+                'rank': round(score * 10),
                 'explanation': explanation
-            })
+            }
+    
+    def generate_ranking(self, student_index=None, student_data=None):
+        """
+        Generate university rankings for a student using GenAI
         
-        # Sort rankings by rank in descending order
-        rankings = sorted(rankings, key=lambda x: x['rank'], reverse=True)
+        Args:
+            student_index: Index of the student in the dataframe (if using existing data)
+            student_data: Dictionary containing student data (if providing new data)
+            
+        Returns:
+            rankings: List of dictionaries with university rankings and explanations
+        """
+        # Restore Top 10 order, then sort rankings by rank in descending order
+        ranked = sorted(self.iter_ranking(student_index, student_data), key=lambda item: item[0])
+        rankings = sorted([ranking for _, ranking in ranked], key=lambda x: x['rank'], reverse=True)
         
         return rankings
 
@@ -3,8 +3,17 @@ import numpy as np
 import re
 import json
 import os
+import sys
 import getpass
 from fuzzywuzzy import fuzz
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from student_features import (
+    CourseVocabulary, StudentFeatureStore, extract_student_features, intern_catalog_courses,
+    parse_extracurriculars, parse_credit_transfers
+)
+from dataset_registry import registry
+from concurrent_ranking import MAX_CONCURRENCY, RANKING_DEADLINE, iter_analyses
+from pipeline_metrics import metrics
 
 # Import the IBM WatsonX API client
 try:
@@ -17,7 +26,8 @@ except ImportError:
     WATSONX_AVAILABLE = False
 
 class WatsonXOfficialMatcher:
-    def __init__(self, student_data_path, university_requirements_path, project_id=None, api_key=None):
+    def __init__(self, student_data_path, university_requirements_path, project_id=None, api_key=None,
+                 max_concurrency=MAX_CONCURRENCY, ranking_deadline=RANKING_DEADLINE):
         """
         Initialize the WatsonX Official Matcher with student and university data
         
@@ -26,9 +36,17 @@ class WatsonXOfficialMatcher:
             university_requirements_path: Path to the CSV file containing university requirements
             project_id: Project ID for IBM Watson service (optional)
             api_key: API key for IBM Watson service (optional)
+            max_concurrency: Maximum number of concurrent WatsonX requests per ranking
+            ranking_deadline: Seconds a ranking waits for WatsonX before using traditional scoring
         """
-        self.students_df = pd.read_csv(student_data_path)
-        self.universities_df = pd.read_csv(university_requirements_path)
+        self.max_concurrency = max_concurrency
+        self.ranking_deadline = ranking_deadline
+        self.students_df = registry.read_csv(student_data_path)
+        self.catalog = registry.catalog(university_requirements_path)
+        self.universities_df = self.catalog.universities_df.copy(deep=False)
+        self.course_vocabulary = CourseVocabulary()
+        intern_catalog_courses(self.universities_df, self.course_vocabulary)
+        self.student_features = StudentFeatureStore(self.students_df, self.course_vocabulary, intern=True)
         
         # Try to get credentials from config file or environment variables
         try:
@@ -90,35 +108,20 @@ class WatsonXOfficialMatcher:
     
     def parse_extracurriculars(self, extracurriculars_str):
         """Parse the extracurriculars string into a list of activities"""
-        if pd.isna(extracurriculars_str):
-            return []
-        
-        activities = extracurriculars_str.split('), ')
-        activities = [a.strip() for a in activities]
-        activities = [re.sub(r' -> \(.*$', '', a) for a in activities]
-        
-        # Clean up the last item which might have a trailing parenthesis
-        if activities and activities[-1].endswith(')'):
-            activities[-1] = re.sub(r' -> \(.*\)$', '', activities[-1])
-            
-        return activities
+        return parse_extracurriculars(extracurriculars_str)
     
     def parse_credit_transfers(self, credit_transfer_str):
         """Parse the credit transfer string into a list of course codes"""
-        if pd.isna(credit_transfer_str):
-            return []
-            
-        courses = credit_transfer_str.split(', ')
-        courses = [c.strip() for c in courses]
-        return courses
+        return parse_credit_transfers(credit_transfer_str)
     
-    def analyze_with_watsonx(self, student_data, university_data):
+    def analyze_with_watsonx(self, student_data, university_data, features=None):
         """
         Use IBM WatsonX to analyze the match between student and university
         
         Args:
             student_data: Dictionary containing student information
             university_data: Dictionary containing university requirements
+            features: Pre-parsed StudentFeatures for the fallback scoring (optional)
             
         Returns:
             score: Float between 0 and 1 representing match quality
@@ -126,22 +129,65 @@ class WatsonXOfficialMatcher:
         """
         if not self.model:
             # Fallback to traditional scoring if model not available
-            return self.calculate_traditional_match(student_data, university_data)
+            return self.calculate_traditional_match(student_data, university_data, features)
         
         try:
-            # Prepare prompt for WatsonX
-            prompt = self._create_watsonx_prompt(student_data, university_data)
-            
-            # Generate response using WatsonX
-            response = self.model.generate(prompt)
-            
-            # Parse the response
-            return self._parse_watsonx_response(response)
+            metrics.increment('llm_requests_total')
+            with metrics.stage('llm_call'):
+                return self.request_watsonx_analysis(student_data, university_data)
                 
         except Exception as e:
             print(f"Error using WatsonX: {e}")
+            metrics.increment('llm_errors_total')
             # Fallback to traditional scoring
-            return self.calculate_traditional_match(student_data, university_data)
+            return self.fallback_match(student_data, university_data, features, 'error')
+    
+    def traditional_match(self, student_data, university_data, features=None):
+        """Traditional scoring of a university, timed as the traditional_scoring stage"""
+        with metrics.stage('traditional_scoring'):
+            return self.calculate_traditional_match(student_data, university_data, features)
+    
+    def fallback_match(self, student_data, university_data, features=None, reason='error'):
+        """
+        Traditional scoring of a university in place of a failed or late WatsonX analysis
+        
+        Args:
+            student_data: Dictionary containing student information
+            university_data: Dictionary containing university requirements
+            features: Pre-parsed StudentFeatures (optional)
+            reason: Why the analysis fell back ('error' or 'deadline')
+            
+        Returns:
+            score: Float between 0 and 1 representing match quality
+            explanation: String with detailed explanation
+        """
+        metrics.increment('llm_fallbacks_total', reason=reason)
+        with metrics.stage('fallback'):
+            return self.calculate_traditional_match(student_data, university_data, features)
+    
+    def request_watsonx_analysis(self, student_data, university_data):
+        """
+        Send one match analysis request to WatsonX, without the fallback
+        
+        Args:
+            student_data: Dictionary containing student information
+            university_data: Dictionary containing university requirements
+            
+        Returns:
+            score: Float between 0 and 1 representing match quality
+            explanation: String with detailed explanation
+            
+        Raises:
+            Exception: Any error raised by the WatsonX client
+        """
+        # Prepare prompt for WatsonX
+        prompt = self._create_watsonx_prompt(student_data, university_data)
+        
+        # Generate response using WatsonX
+        response = self.model.generate(prompt)
+        
+        # Parse the response
+        return self._parse_watsonx_response(response)
     
     def _create_watsonx_prompt(self, student, university):
         """Create a prompt for WatsonX to analyze the match"""
@@ -236,23 +282,27 @@ class WatsonXOfficialMatcher:
             print(f"Error parsing WatsonX response: {e}")
             return 0.5, "Error in AI analysis. Using default score."
     
-    def calculate_traditional_match(self, student, university):
+    def calculate_traditional_match(self, student, university, features=None):
         """
         Calculate match score using traditional algorithm (fallback method)
         
         Args:
             student: Dictionary containing student data
             university: Dictionary containing university requirements
+            features: Pre-parsed StudentFeatures for the student (optional)
             
         Returns:
             score: Float between 0 and 1 representing match quality
             explanation: String with explanation
         """
+        if features is None:
+            features = extract_student_features(student, self.course_vocabulary)
+        
         explanations = []
         
         # GPA comparison
         gpa_score = 0
-        student_gpa = float(student['GPA'])
+        student_gpa = features.gpa
         min_gpa = float(university['Min GPA'])
         
         if student_gpa >= min_gpa:
@@ -271,7 +321,7 @@ class WatsonXOfficialMatcher:
         
         # IELTS comparison
         ielts_score = 0
-        student_ielts = float(student['IELTS'])
+        student_ielts = features.ielts
         min_ielts = float(university['Min IELTS'])
         
         if student_ielts >= min_ielts:
@@ -290,42 +340,33 @@ class WatsonXOfficialMatcher:
         
         # Extracurriculars comparison
         extracurriculars_score = 0
-        student_extracurriculars = self.parse_extracurriculars(student['Extra Co-Curriculars'])
+        num_extracurriculars = features.num_extracurriculars
         required_extracurriculars = int(university['Required Extracurriculars'])
         
-        if len(student_extracurriculars) >= required_extracurriculars:
-            extracurriculars_score = min(1.0, len(student_extracurriculars) / required_extracurriculars)
-            if len(student_extracurriculars) > required_extracurriculars + 1:
-                explanations.append(f"Your {len(student_extracurriculars)} extracurricular activities exceed the minimum requirement of {required_extracurriculars}.")
+        if num_extracurriculars >= required_extracurriculars:
+            extracurriculars_score = min(1.0, num_extracurriculars / required_extracurriculars)
+            if num_extracurriculars > required_extracurriculars + 1:
+                explanations.append(f"Your {num_extracurriculars} extracurricular activities exceed the minimum requirement of {required_extracurriculars}.")
             else:
-                explanations.append(f"Your {len(student_extracurriculars)} extracurricular activities meet the minimum requirement of {required_extracurriculars}.")
+                explanations.append(f"Your {num_extracurriculars} extracurricular activities meet the minimum requirement of {required_extracurriculars}.")
         else:
-            extracurriculars_score = max(0, 0.7 * (len(student_extracurriculars) / required_extracurriculars))
-            explanations.append(f"You have {len(student_extracurriculars)} extracurricular activities, which is below the minimum requirement of {required_extracurriculars}.")
+            extracurriculars_score = max(0, 0.7 * (num_extracurriculars / required_extracurriculars))
+            explanations.append(f"You have {num_extracurriculars} extracurricular activities, which is below the minimum requirement of {required_extracurriculars}.")
         
         # Credit transfer comparison
-        student_courses = self.parse_credit_transfers(student['Credit Transfer Requirement'])
-        
-        # Simple field detection
-        extracurriculars_text = student['Extra Co-Curriculars'].lower() if not pd.isna(student['Extra Co-Curriculars']) else ""
-        
-        if any(keyword in extracurriculars_text for keyword in ['engineering', 'robot', 'design', 'tech']):
-            field = 'Engineering Credit Transfer'
-        elif any(keyword in extracurriculars_text for keyword in ['science', 'biology', 'chemistry', 'physics', 'lab']):
-            field = 'Science Credit Transfer'
-        else:
-            field = 'Business Credit Transfer'
-        
-        university_courses = self.parse_credit_transfers(university[field])
+        # The field is determined by a simple keyword analysis of extracurriculars
+        field = features.field
         
         # Calculate overlap
-        if not student_courses or not university_courses:
+        if not features.has_courses:
             credit_transfer_score = 0
         else:
-            student_course_set = set(student_courses)
-            university_course_set = set(university_courses)
-            overlap = len(student_course_set.intersection(university_course_set))
-            credit_transfer_score = min(1.0, overlap / len(student_course_set)) if len(student_course_set) > 0 else 0
+            university_courses = self.course_vocabulary.intern_all(self.parse_credit_transfers(university[field]))
+            if not university_courses:
+                credit_transfer_score = 0
+            else:
+                overlap = len(set(features.course_ids).intersection(university_courses))
+                credit_transfer_score = min(1.0, overlap / len(features.course_ids))
         
         if credit_transfer_score > 0.8:
             explanations.append(f"Excellent credit transfer potential for your courses in the {field.split(' ')[0]} field.")
@@ -350,56 +391,86 @@ class WatsonXOfficialMatcher:
         
         return weighted_score, " ".join(explanations)
     
-    def generate_ranking(self, student_index=None, student_data=None):
+    def iter_ranking(self, student_index=None, student_data=None):
         """
-        Generate university rankings for a student using WatsonX
+        Rank a student's universities using WatsonX, yielding each ranking as soon as it is ready
+        
+        The universities are analyzed concurrently, at most max_concurrency at a
+        time; analyses unfinished after ranking_deadline seconds fall back to
+        traditional scoring.
         
         Args:
             student_index: Index of the student in the dataframe (if using existing data)
             student_data: Dictionary containing student data (if providing new data)
             
-        Returns:
-            rankings: List of dictionaries with university rankings and explanations
+        Yields:
+            (position, ranking): Position of the university in the student's Top 10
+                and its ranking dictionary, in completion order
         """
         if student_data is None and student_index is not None:
             student_data = self.students_df.iloc[student_index].to_dict()
+            features = self.student_features.row(student_index)
         elif student_data is None:
             raise ValueError("Either student_index or student_data must be provided")
+        else:
+            features = extract_student_features(student_data, self.course_vocabulary)
         
         # Extract student's top 10 universities
         top_10_universities = student_data['Top 10'].split(', ')
         
-        rankings = []
-        
-        for uni_name in top_10_universities:
-            # Find the university in the requirements dataframe
-            uni_data = self.universities_df[self.universities_df['University Name'] == uni_name]
-            
-            if len(uni_data) == 0:
+        # Find the universities in the requirements catalog
+        with metrics.stage('catalog_lookup'):
+            uni_requirements = [self.catalog.get(uni_name) for uni_name in top_10_universities]
+        known_positions = []
+        for position, (uni_name, requirements) in enumerate(zip(top_10_universities, uni_requirements)):
+            if requirements is None:
                 # University not found in requirements database
-                rankings.append({
+                yield position, {
                     'university': uni_name,
                     'rank': 0,
                     'explanation': "University requirements data not available."
-                })
-                continue
-            
-            uni_requirements = uni_data.iloc[0].to_dict()
-            
-            # Use WatsonX to analyze the match
-            score, explanation = self.analyze_with_watsonx(student_data, uni_requirements)
+                }
+            else:
+                known_positions.append(position)
+        
+        # Use WatsonX to analyze the matches, all universities at once
+        known_universities = [uni_requirements[position] for position in known_positions]
+        if self.model:
+            results = iter_analyses(
+                lambda university: self.analyze_with_watsonx(student_data, university, features),
+                lambda university: self.fallback_match(student_data, university, features, 'deadline'),
+                known_universities, self.max_concurrency, self.ranking_deadline
+            )
+        else:
+            results = (
+                (i, self.traditional_match(student_data, university, features))
+                for i, university in enumerate(known_universities)
+            )
+        
+        for i, (score, explanation) in results:
+            position = known_positions[i]
             
             # Convert score to 0-10 scale and round to nearest integer
-            rank = round(score * 10)
-            
-            rankings.append({
-                'university': uni_name,
-                'rank': rank,
+            yield position, {
+                'university': top_10_universities[position],
+                'rank': round(score * 10),
                 'explanation': explanation
-            })
+            }
+    
+    def generate_ranking(self, student_index=None, student_data=None):
+        """
+        Generate university rankings for a student using WatsonX
         
-        # Sort rankings by rank in descending order
-        rankings = sorted(rankings, key=lambda x: x['rank'], reverse=True)
+        Args:
+            student_index: Index of the student in the dataframe (if using existing data)
+            student_data: Dictionary containing student data (if providing new data)
+            
+        Returns:
+            rankings: List of dictionaries with university rankings and explanations
+        """
+        # Restore Top 10 order, then sort rankings by rank in descending order
+        ranked = sorted(self.iter_ranking(student_index, student_data), key=lambda item: item[0])
+        rankings = sorted([ranking for _, ranking in ranked], key=lambda x: x['rank'], reverse=True)
         
         return rankings
 
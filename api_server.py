@@ -3,31 +3,55 @@
 API Server for Student Exchange Platform
 Connects the React frontend to the IBM WatsonX backend
 """
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 import pandas as pd
+import json
 import sys
 import os
+import time
 sys.path.append(os.path.join(os.path.dirname(__file__), 'GenAI_Version'))
+from dataset_registry import registry
+from match_explanation import render_explanation
+from pipeline_metrics import metrics
+from result_cache import RankingCache
+from university_matcher import UniversityMatcher
 
 # Import the WatsonX SDK Matcher with fallback
 try:
     from watsonx_sdk_matcher import WatsonXSDKMatcher
     WATSONX_SDK_AVAILABLE = True
 except ImportError:
-    print("WatsonX SDK Matcher not available. Using simulated results.")
-    WATSONX_SDK_AVAILABLE = False
-    WatsonXSDKMatcher = None
+    try:
+        # The official SDK matcher in GenAI_Version
+        from official_matcher import WatsonXOfficialMatcher as WatsonXSDKMatcher
+        WATSONX_SDK_AVAILABLE = True
+    except ImportError:
+        print("WatsonX SDK Matcher not available. Using simulated results.")
+        WATSONX_SDK_AVAILABLE = False
+        WatsonXSDKMatcher = None
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+STUDENT_DATA_PATH = 'exchange_program_dataset_updated.csv'
+UNIVERSITY_REQUIREMENTS_PATH = 'university_requirements.csv'
+
+# Largest number of students accepted by one /api/match/batch request
+MAX_BATCH_SIZE = 1000
+
+# Largest number of results returned by /api/recommend and the best-students query
+MAX_TOP_K = 100
+
+# Student fields every /api/match request must include
+REQUIRED_FIELDS = ['First Name', 'Last Name', 'GPA', 'IELTS', 'Top 10']
+
 # Initialize the WatsonX matcher if available
 if WATSONX_SDK_AVAILABLE:
     try:
         matcher = WatsonXSDKMatcher(
-            student_data_path='exchange_program_dataset.csv',
-            university_requirements_path='university_requirements.csv'
+            student_data_path=STUDENT_DATA_PATH,
+            university_requirements_path=UNIVERSITY_REQUIREMENTS_PATH
         )
     except Exception as e:
         print(f"Error initializing WatsonX SDK Matcher: {e}")
@@ -35,6 +59,102 @@ if WATSONX_SDK_AVAILABLE:
 else:
     matcher = None
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Count the request and record its latency once the response body has been sent"""
+    started = g.get('request_started', time.perf_counter())
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    method = request.method
+    status = str(response.status_code)
+    # Streamed responses are only complete when closed
+    response.call_on_close(lambda: metrics.observe_request(method, route, status, time.perf_counter() - started))
+    return response
+
+def current_catalog():
+    """
+    University catalog for O(1) requirement lookups: the matcher's, or the
+    shared registry copy (reloaded when the requirements file changes)
+    """
+    catalog = getattr(matcher, 'catalog', None)
+    if catalog is not None:
+        return catalog
+    try:
+        return registry.catalog(UNIVERSITY_REQUIREMENTS_PATH)
+    except Exception as e:
+        print(f"Error loading university catalog: {e}")
+        return None
+
+catalog = current_catalog()
+
+# Serialized 'details' object of every university, rebuilt when the catalog version changes
+_detail_payloads = {'version': None, 'payloads': {}}
+
+def detail_payloads(catalog):
+    """Map university name to its serialized details JSON for the given catalog"""
+    if catalog is None:
+        return {}
+    if _detail_payloads['version'] != catalog.version:
+        payloads = {}
+        for uni_name in catalog:
+            uni_row = catalog[uni_name]
+            payloads[uni_name] = json.dumps({
+                'minGPA': float(uni_row['Min GPA']),
+                'minIELTS': float(uni_row['Min IELTS']),
+                'requiredExtracurriculars': int(uni_row['Required Extracurriculars']),
+                'additionalRequirements': uni_row['Additional Requirements']
+            }, sort_keys=True)
+        _detail_payloads['payloads'] = payloads
+        _detail_payloads['version'] = catalog.version
+    return _detail_payloads['payloads']
+
+# Build the payloads at startup rather than on the first request
+detail_payloads(catalog)
+
+def ranking_fragment(rank, payloads, explanations=True):
+    """
+    Serialize one matcher ranking into its /api/match JSON object
+    
+    The university's details come from the prebuilt payloads, so only the
+    score and explanation are serialized per request. With explanations=False
+    the explanation field is left out (lazy explanations are never rendered).
+    """
+    if not explanations:
+        return '{"details": %s, "score": %s, "university": %s}' % (
+            payloads.get(rank['university'], '{}'),
+            json.dumps(rank['rank']),
+            json.dumps(rank['university'])
+        )
+    return '{"details": %s, "explanation": %s, "score": %s, "university": %s}' % (
+        payloads.get(rank['university'], '{}'),
+        json.dumps(rank['explanation'], default=render_explanation),
+        json.dumps(rank['rank']),
+        json.dumps(rank['university'])
+    )
+
+def serialize_rankings(rankings, catalog, explanations=True):
+    """Serialize matcher rankings into the /api/match 'rankings' JSON array"""
+    payloads = detail_payloads(catalog)
+    return '[' + ', '.join(ranking_fragment(rank, payloads, explanations) for rank in rankings) + ']'
+
+def rankings_response(rankings_json):
+    """JSON response around an already serialized rankings array"""
+    return app.response_class('{"rankings": ' + rankings_json + '}\n', mimetype='application/json')
+
+# Serialized /api/match rankings (one JSON object per university, in ranking
+# order) for resubmitted student profiles. Only results
+# of deterministic (traditional) scoring are cached: LLM explanations depend on
+# fields outside the cache key, such as the student's name, and the LLM matcher
+# falls back to traditional scoring on API errors without telling the caller.
+ranking_cache = RankingCache()
+
+def cacheable_rankings():
+    """True if the matcher's results depend only on the cache key fields"""
+    return matcher is not None and getattr(matcher, 'model', None) is None
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -44,6 +164,33 @@ def health_check():
         'watsonx_available': matcher is not None and getattr(matcher, 'model', None) is not None
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Request, matching stage, cache and LLM metrics in the Prometheus text format
+    
+    Request counts and latency histograms are per route; stage histograms
+    cover catalog lookup, traditional scoring, LLM calls and fallbacks.
+    """
+    cache_stats = ranking_cache.stats()
+    registry_stats = registry.stats()
+    registry_lookups = registry_stats['hits'] + registry_stats['loads']
+    cache_metrics = [
+        ('ranking_cache_hits_total', 'counter', 'Ranking cache lookups served from memory', cache_stats['hits']),
+        ('ranking_cache_misses_total', 'counter', 'Ranking cache lookups that missed', cache_stats['misses']),
+        ('ranking_cache_hit_ratio', 'gauge', 'Share of ranking cache lookups served from memory', cache_stats['hit_ratio']),
+        ('ranking_cache_entries', 'gauge', 'Rankings held in the ranking cache', cache_stats['entries']),
+        ('ranking_cache_bytes', 'gauge', 'Approximate size of the ranking cache', cache_stats['bytes']),
+        ('ranking_cache_evictions_total', 'counter', 'Rankings evicted from the ranking cache', cache_stats['evictions']),
+        ('ranking_cache_invalidations_total', 'counter', 'Ranking cache clears after a catalog change', cache_stats['invalidations']),
+        ('dataset_registry_hits_total', 'counter', 'Dataset lookups served by the dataset registry', registry_stats['hits']),
+        ('dataset_registry_loads_total', 'counter', 'Datasets loaded or reloaded from disk', registry_stats['loads']),
+        ('dataset_registry_hit_ratio', 'gauge', 'Share of dataset lookups served without loading',
+         registry_stats['hits'] / registry_lookups if registry_lookups else 0.0),
+        ('dataset_registry_entries', 'gauge', 'Datasets held by the dataset registry', registry_stats['entries'])
+    ]
+    return app.response_class(metrics.render(cache_metrics), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/universities', methods=['GET'])
 def get_universities():
     """Get all available universities"""
@@ -66,6 +213,197 @@ def get_universities():
         'universities': universities
     })
 
+def validate_student(student_data):
+    """
+    Check a student profile and fill in the optional fields
+    
+    Returns:
+        missing_field: Name of the first missing required field, or None if valid
+    """
+    for field in REQUIRED_FIELDS:
+        if field not in student_data:
+            return field
+    
+    # Set default values for optional fields
+    if 'Extra Co-Curriculars' not in student_data:
+        student_data['Extra Co-Curriculars'] = ''
+    
+    if 'Credit Transfer Requirement' not in student_data:
+        student_data['Credit Transfer Requirement'] = ''
+    
+    return None
+
+def batch_matcher():
+    """
+    Traditional matcher whose vectorized engine scores /api/match/batch,
+    rebuilt when the requirements file changes
+    """
+    return registry.get(
+        ('api_batch_matcher', STUDENT_DATA_PATH, UNIVERSITY_REQUIREMENTS_PATH),
+        lambda: UniversityMatcher(STUDENT_DATA_PATH, UNIVERSITY_REQUIREMENTS_PATH, load_students=False),
+        [UNIVERSITY_REQUIREMENTS_PATH]
+    )
+
+def simulated_rankings(student_data):
+    """
+    Simulated rankings from GPA and IELTS alone, used when no matcher is available
+    
+    Returns:
+        formatted_rankings: /api/match ranking objects sorted by score
+    """
+    universities = student_data['Top 10'].split(', ')
+    student_gpa = float(student_data['GPA'])
+    student_ielts = float(student_data['IELTS'])
+    
+    formatted_rankings = []
+    for uni in universities:
+        # Generate a simulated score based on GPA and IELTS
+        base_score = 7 + (student_gpa - 3.0) + (student_ielts - 6.5) / 2
+        score = min(10, max(1, base_score))
+        rounded_score = round(score)
+        
+        # Generate a simulated explanation
+        if score >= 8:
+            explanation = f"Excellent match for {uni}! Your GPA of {student_gpa} and IELTS score of {student_ielts} exceed the university's requirements."
+        elif score >= 6:
+            explanation = f"Good match for {uni}. Your academic profile meets most of the university's requirements."
+        else:
+            explanation = f"This university may be challenging to get into with your current profile. Consider improving your GPA and language scores."
+        
+        formatted_rankings.append({
+            'university': uni,
+            'score': rounded_score,
+            'explanation': explanation,
+            'details': {
+                'minGPA': 3.5,
+                'minIELTS': 6.5,
+                'requiredExtracurriculars': 2,
+                'additionalRequirements': 'No additional requirements'
+            }
+        })
+    
+    # Sort by score
+    formatted_rankings.sort(key=lambda x: x['score'], reverse=True)
+    return formatted_rankings
+
+def cohort_matcher():
+    """
+    Traditional matcher with the whole student file loaded, whose precomputed
+    score arrays answer the advisor queries; rebuilt when a data file changes
+    """
+    return registry.get(
+        ('api_cohort_matcher', STUDENT_DATA_PATH, UNIVERSITY_REQUIREMENTS_PATH),
+        lambda: UniversityMatcher(STUDENT_DATA_PATH, UNIVERSITY_REQUIREMENTS_PATH),
+        [STUDENT_DATA_PATH, UNIVERSITY_REQUIREMENTS_PATH]
+    )
+
+def top_k_argument(value):
+    """
+    Parse the requested number of results
+    
+    Returns:
+        k: Integer between 1 and MAX_TOP_K, or None if value is not valid
+    """
+    try:
+        k = int(value)
+    except (TypeError, ValueError):
+        return None
+    return k if 1 <= k <= MAX_TOP_K else None
+
+@app.route('/api/recommend', methods=['POST'])
+def recommend_universities():
+    """
+    Recommend the best matching universities from the whole catalog, not only the student's Top 10
+    
+    Expected JSON payload:
+    {
+        "student": {...same fields as the /api/match student...},
+        "k": 10
+    }
+    
+    "k" is optional. Recommendations are returned best first, in the format of
+    the /api/match rankings: {"recommendations": [...]}
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or 'student' not in data:
+            return jsonify({
+                'error': 'Invalid request format',
+                'message': 'Request must include student data'
+            }), 400
+        
+        student_data = data['student']
+        
+        missing_field = validate_student(student_data)
+        if missing_field is not None:
+            return jsonify({
+                'error': f'Missing required field: {missing_field}',
+                'message': f'Student data must include {missing_field}'
+            }), 400
+        
+        k = top_k_argument(data.get('k', 10))
+        if k is None:
+            return jsonify({
+                'error': 'Invalid k',
+                'message': f'k must be a whole number between 1 and {MAX_TOP_K}'
+            }), 400
+        
+        advisor_matcher = cohort_matcher()
+        with metrics.stage('traditional_scoring'):
+            recommendations = advisor_matcher.recommend_universities(student_data=student_data, k=k, lazy_explanations=True)
+        
+        return app.response_class(
+            '{"recommendations": ' + serialize_rankings(recommendations, advisor_matcher.catalog) + '}\n',
+            mimetype='application/json'
+        )
+    
+    except Exception as e:
+        return jsonify({
+            'error': 'Server error',
+            'message': str(e)
+        }), 500
+
+@app.route('/api/universities/<path:uni_name>/students', methods=['GET'])
+def best_students(uni_name):
+    """
+    List the students of the dataset that best match a university
+    
+    Query parameters:
+        k: Number of students to return (default 10)
+    
+    Returns {"university": ..., "students": [{"student_index", "name", "rank", "score"}, ...]}
+    with the best match first.
+    """
+    k = top_k_argument(request.args.get('k', 10))
+    if k is None:
+        return jsonify({
+            'error': 'Invalid k',
+            'message': f'k must be a whole number between 1 and {MAX_TOP_K}'
+        }), 400
+    
+    try:
+        advisor_matcher = cohort_matcher()
+        if uni_name not in advisor_matcher.catalog:
+            return jsonify({
+                'error': 'University not found',
+                'message': f'{uni_name} is not in the university requirements'
+            }), 404
+        
+        with metrics.stage('traditional_scoring'):
+            students = advisor_matcher.best_students_for_university(uni_name, k)
+        
+        return jsonify({
+            'university': uni_name,
+            'students': students
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'error': 'Server error',
+            'message': str(e)
+        }), 500
+
 @app.route('/api/match', methods=['POST'])
 def match_universities():
     """
@@ -95,92 +433,42 @@ def match_universities():
         
         student_data = data['student']
         
-        # Validate required fields
-        required_fields = ['First Name', 'Last Name', 'GPA', 'IELTS', 'Top 10']
-        for field in required_fields:
-            if field not in student_data:
-                return jsonify({
-                    'error': f'Missing required field: {field}',
-                    'message': f'Student data must include {field}'
-                }), 400
-        
-        # Set default values for optional fields
-        if 'Extra Co-Curriculars' not in student_data:
-            student_data['Extra Co-Curriculars'] = ''
+        missing_field = validate_student(student_data)
+        if missing_field is not None:
+            return jsonify({
+                'error': f'Missing required field: {missing_field}',
+                'message': f'Student data must include {missing_field}'
+            }), 400
         
-        if 'Credit Transfer Requirement' not in student_data:
-            student_data['Credit Transfer Requirement'] = ''
+        catalog = current_catalog()
+        catalog_version = catalog.version if catalog is not None else None
+        use_cache = cacheable_rankings()
+        if use_cache:
+            cached_rankings = ranking_cache.get(student_data, catalog_version)
+            if cached_rankings is not None:
+                return rankings_response('[' + ', '.join(cached_rankings) + ']')
         
         if matcher is not None:
             # Generate rankings using WatsonX
             try:
                 rankings = matcher.evaluate_new_student(student_data)
                 
-                # Format the response
-                formatted_rankings = []
-                for rank in rankings:
-                    # Get university details from the database
-                    uni_data = matcher.universities_df[matcher.universities_df['University Name'] == rank['university']]
-                    
-                    uni_details = {}
-                    if not uni_data.empty:
-                        uni_row = uni_data.iloc[0]
-                        uni_details = {
-                            'minGPA': float(uni_row['Min GPA']),
-                            'minIELTS': float(uni_row['Min IELTS']),
-                            'requiredExtracurriculars': int(uni_row['Required Extracurriculars']),
-                            'additionalRequirements': uni_row['Additional Requirements']
-                        }
-                    
-                    formatted_rankings.append({
-                        'university': rank['university'],
-                        'score': rank['rank'],
-                        'explanation': rank['explanation'],
-                        'details': uni_details
-                    })
+                # Format the response from the prebuilt university details
+                payloads = detail_payloads(catalog)
+                formatted_rankings = tuple(ranking_fragment(rank, payloads) for rank in rankings)
                 
-                return jsonify({
-                    'rankings': formatted_rankings
-                })
+                if use_cache:
+                    ranking_cache.put(student_data, catalog_version, formatted_rankings)
+                
+                return rankings_response('[' + ', '.join(formatted_rankings) + ']')
             except Exception as e:
                 print(f"Error using WatsonX matcher: {e}")
                 # Fall through to simulated results
         
         # If matcher is not available or failed, generate simulated results
         print("Using simulated results")
-        universities = student_data['Top 10'].split(', ')
-        student_gpa = float(student_data['GPA'])
-        student_ielts = float(student_data['IELTS'])
-        
-        formatted_rankings = []
-        for uni in universities:
-            # Generate a simulated score based on GPA and IELTS
-            base_score = 7 + (student_gpa - 3.0) + (student_ielts - 6.5) / 2
-            score = min(10, max(1, base_score))
-            rounded_score = round(score)
-            
-            # Generate a simulated explanation
-            if score >= 8:
-                explanation = f"Excellent match for {uni}! Your GPA of {student_gpa} and IELTS score of {student_ielts} exceed the university's requirements."
-            elif score >= 6:
-                explanation = f"Good match for {uni}. Your academic profile meets most of the university's requirements."
-            else:
-                explanation = f"This university may be challenging to get into with your current profile. Consider improving your GPA and language scores."
-            
-            formatted_rankings.append({
-                'university': uni,
-                'score': rounded_score,
-                'explanation': explanation,
-                'details': {
-                    'minGPA': 3.5,
-                    'minIELTS': 6.5,
-                    'requiredExtracurriculars': 2,
-                    'additionalRequirements': 'No additional requirements'
-                }
-            })
-        
-        # Sort by score
-        formatted_rankings.sort(key=lambda x: x['score'], reverse=True)
+        with metrics.stage('fallback'):
+            formatted_rankings = simulated_rankings(student_data)
         
         return jsonify({
             'rankings': formatted_rankings,
@@ -193,6 +481,170 @@ def match_universities():
             'message': str(e)
         }), 500
 
+def match_events(student_data):
+    """
+    Generate the /api/match/stream events of a student as (event, JSON object) pairs
+    
+    A 'result' event is produced for each university as soon as it is scored,
+    then a 'summary' event with all rankings sorted as /api/match returns them.
+    An 'error' event ends the stream if the matcher fails after results were sent.
+    """
+    catalog = current_catalog()
+    catalog_version = catalog.version if catalog is not None else None
+    use_cache = cacheable_rankings()
+    cached_rankings = ranking_cache.get(student_data, catalog_version) if use_cache else None
+    
+    if cached_rankings is not None:
+        for fragment in cached_rankings:
+            yield 'result', '{"result": %s, "type": "result"}' % fragment
+        yield 'summary', '{"rankings": [%s], "type": "summary"}' % ', '.join(cached_rankings)
+        return
+    
+    if matcher is not None:
+        payloads = detail_payloads(catalog)
+        ranked = []
+        try:
+            if hasattr(matcher, 'iter_ranking'):
+                results = matcher.iter_ranking(student_data=student_data)
+            else:
+                results = enumerate(matcher.evaluate_new_student(student_data))
+            for position, rank in results:
+                fragment = ranking_fragment(rank, payloads)
+                ranked.append((position, rank['rank'], fragment))
+                yield 'result', '{"result": %s, "type": "result"}' % fragment
+        except Exception as e:
+            print(f"Error using WatsonX matcher: {e}")
+            if ranked:
+                yield 'error', json.dumps({'message': str(e), 'type': 'error'}, sort_keys=True)
+                return
+            ranked = None
+        
+        if ranked is not None:
+            # Restore Top 10 order, then sort rankings by rank in descending order
+            ranked.sort(key=lambda item: item[0])
+            ranked.sort(key=lambda item: item[1], reverse=True)
+            formatted_rankings = tuple(fragment for _, _, fragment in ranked)
+            
+            if use_cache:
+                ranking_cache.put(student_data, catalog_version, formatted_rankings)
+            
+            yield 'summary', '{"rankings": [%s], "type": "summary"}' % ', '.join(formatted_rankings)
+            return
+    
+    # If matcher is not available or failed, stream simulated results
+    print("Using simulated results")
+    with metrics.stage('fallback'):
+        formatted_rankings = simulated_rankings(student_data)
+    for ranking in formatted_rankings:
+        yield 'result', json.dumps({'result': ranking, 'type': 'result'}, sort_keys=True)
+    yield 'summary', json.dumps({'rankings': formatted_rankings, 'simulated': True, 'type': 'summary'}, sort_keys=True)
+
+@app.route('/api/match/stream', methods=['POST'])
+def match_universities_stream():
+    """
+    Match student preferences with universities, streaming each result as soon as it is ready
+    
+    Expects the same JSON payload as /api/match. The response is newline
+    delimited JSON (application/x-ndjson), or server-sent events
+    (text/event-stream) with ?format=sse or an Accept: text/event-stream header:
+    {"result": {...one /api/match ranking...}, "type": "result"}
+    ...
+    {"rankings": [...same as /api/match...], "type": "summary"}
+    """
+    data = request.get_json(silent=True)
+    
+    if not data or 'student' not in data:
+        return jsonify({
+            'error': 'Invalid request format',
+            'message': 'Request must include student data'
+        }), 400
+    
+    student_data = data['student']
+    
+    missing_field = validate_student(student_data)
+    if missing_field is not None:
+        return jsonify({
+            'error': f'Missing required field: {missing_field}',
+            'message': f'Student data must include {missing_field}'
+        }), 400
+    
+    use_sse = (request.args.get('format') == 'sse'
+               or request.accept_mimetypes.best_match(['application/x-ndjson', 'text/event-stream']) == 'text/event-stream')
+    
+    def generate():
+        try:
+            for event, payload in match_events(student_data):
+                yield f"event: {event}\ndata: {payload}\n\n" if use_sse else payload + '\n'
+        except Exception as e:
+            payload = json.dumps({'message': str(e), 'type': 'error'}, sort_keys=True)
+            yield f"event: error\ndata: {payload}\n\n" if use_sse else payload + '\n'
+    
+    response = app.response_class(generate(), mimetype='text/event-stream' if use_sse else 'application/x-ndjson')
+    # Ask proxies not to buffer the stream
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/match/batch', methods=['POST'])
+def match_universities_batch():
+    """
+    Match many students at once with the vectorized traditional scorer
+    
+    Expected JSON payload:
+    {
+        "students": [{...same fields as the /api/match student...}, ...],
+        "explanations": true
+    }
+    
+    "explanations" is optional; false leaves the explanation texts out of the
+    rankings. Results are returned in the order of the students:
+    {"results": [{"rankings": [...]}, ...]}
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('students'), list):
+            return jsonify({
+                'error': 'Invalid request format',
+                'message': 'Request must include a list of students'
+            }), 400
+        
+        students = data['students']
+        if len(students) > MAX_BATCH_SIZE:
+            return jsonify({
+                'error': 'Too many students',
+                'message': f'A batch can include at most {MAX_BATCH_SIZE} students'
+            }), 400
+        
+        for i, student_data in enumerate(students):
+            missing_field = validate_student(student_data) if isinstance(student_data, dict) else 'student data'
+            if missing_field is not None:
+                return jsonify({
+                    'error': f'Missing required field: {missing_field}',
+                    'message': f'Student {i} must include {missing_field}'
+                }), 400
+        
+        batch_scorer = batch_matcher()
+        explanations = bool(data.get('explanations', True))
+        
+        # One vectorized pass over all students; explanations are rendered only if returned
+        all_rankings = []
+        if students:
+            with metrics.stage('traditional_scoring'):
+                all_rankings = batch_scorer.scoring_engine.generate_rankings(pd.DataFrame(students), lazy_explanations=True)
+        
+        results = ', '.join(
+            '{"rankings": %s}' % serialize_rankings(rankings, batch_scorer.catalog, explanations)
+            for rankings in all_rankings
+        )
+        return app.response_class('{"results": [' + results + ']}\n', mimetype='application/json')
+    
+    except Exception as e:
+        return jsonify({
+            'error': 'Server error',
+            'message': str(e)
+        }), 500
+
 if __name__ == '__main__':
     print("Starting Student Exchange Platform API Server...")
     print(f"WatsonX model available: {matcher.model is not None}")
@@ -0,0 +1,116 @@
+import os
+import pickle
+import time
+
+from summary_table import SummaryTable
+
+CHECKPOINT_FILENAME = 'checkpoint.pkl'
+
+# Minimum number of seconds between two checkpoint writes
+CHECKPOINT_INTERVAL = 60
+
+
+def input_fingerprint(path):
+    """Size and modification time of an input file, to detect edits between runs"""
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+
+
+class BatchCheckpoint:
+    """
+    Progress of a batch run, saved periodically so a killed run can resume.
+
+    Students are always completed in file order, so progress is the number of
+    completed students plus the SummaryTable of their results and the
+    position of the result sink. The run key identifies the inputs and
+    output settings; a checkpoint is only resumed if they are unchanged.
+    """
+
+    def __init__(self, output_dir, run_key, interval=CHECKPOINT_INTERVAL):
+        """
+        Args:
+            output_dir: Output directory of the run (the checkpoint is stored there)
+            run_key: Dictionary identifying the inputs and output settings
+            interval: Minimum number of seconds between checkpoint writes
+        """
+        self.path = f"{output_dir}/{CHECKPOINT_FILENAME}"
+        self.run_key = run_key
+        self.interval = interval
+        self.completed = 0
+        self.table = SummaryTable()
+        self.sink_state = None
+        self._last_saved = time.monotonic()
+
+    @classmethod
+    def start(cls, output_dir, run_key, resume=False, interval=CHECKPOINT_INTERVAL):
+        """
+        Load the checkpoint to resume from, or start a fresh one
+
+        Args:
+            output_dir: Output directory of the run
+            run_key: Dictionary identifying the inputs and output settings
+            resume: Continue from a saved checkpoint if there is a matching one
+            interval: Minimum number of seconds between checkpoint writes
+
+        Returns:
+            checkpoint: BatchCheckpoint with completed > 0 when resuming
+        """
+        checkpoint = cls(output_dir, run_key, interval)
+        if not resume:
+            return checkpoint
+        if not os.path.exists(checkpoint.path):
+            print("No checkpoint found. Starting from the first student.")
+            return checkpoint
+
+        try:
+            with open(checkpoint.path, 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print(f"Error reading checkpoint {checkpoint.path}: {e}. Starting from the first student.")
+            return checkpoint
+
+        if state['run_key'] != run_key:
+            print("Checkpoint was written for different inputs or output settings. Starting from the first student.")
+            return checkpoint
+
+        checkpoint.completed = state['completed']
+        checkpoint.table = state['table']
+        checkpoint.sink_state = state['sink_state']
+        print(f"Resuming after {checkpoint.completed} completed students.")
+        return checkpoint
+
+    def update(self, completed, table, sink, force=False):
+        """
+        Record progress, writing the checkpoint if the interval has passed
+
+        Args:
+            completed: Number of students whose results are in table and sink
+            table: SummaryTable of the completed students
+            sink: ResultSink the results were written to
+            force: Write the checkpoint regardless of the interval
+        """
+        self.completed = completed
+        self.table = table
+        if not sink.resumable:
+            return
+        if not force and time.monotonic() - self._last_saved < self.interval:
+            return
+
+        self.sink_state = sink.checkpoint()
+        state = {
+            'run_key': self.run_key,
+            'completed': completed,
+            'table': table,
+            'sink_state': self.sink_state
+        }
+        # Write to a temporary file first so a crash mid-write keeps the previous checkpoint
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.path)
+        self._last_saved = time.monotonic()
+
+    def remove(self):
+        """Delete the checkpoint once the run has finished"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -1,217 +1,726 @@
 import pandas as pd
+import numpy as np
 import json
 from university_matcher import UniversityMatcher
+from scoring_engine import diff_catalogs
+from html_report import write_html_report
+from result_sinks import SINK_TYPES, PerStudentJSONSink, create_sink, report_filename
+from result_cache import normalize_value
+from summary_table import SummaryTable
+from batch_checkpoint import CHECKPOINT_INTERVAL, BatchCheckpoint, input_fingerprint
+from batch_timing import TIMINGS_FILENAME, StageTimer
+from dataset_registry import registry
+import argparse
+import hashlib
 import os
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 
-def process_all_students(output_dir="results"):
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    matcher = UniversityMatcher(
-        student_data_path='exchange_program_dataset_updated.csv',
-        university_requirements_path='university_requirements.csv'
+STUDENT_DATA_PATH = 'exchange_program_dataset_updated.csv'
+UNIVERSITY_REQUIREMENTS_PATH = 'university_requirements.csv'
+
+# Copy of the requirements the stored results were scored with, used to
+# find which universities changed since the last run
+CATALOG_SNAPSHOT_FILENAME = 'university_requirements_snapshot.csv'
+
+# Hashes of the students behind the stored results, used by incremental runs
+MANIFEST_FILENAME = 'manifest.json'
+
+# Inputs and result settings of the last finished run, used by catalog updates
+RUN_INFO_FILENAME = 'run_info.json'
+
+# Ranks of the cohort under alternative weighting schemes (--compare-weightings)
+WEIGHT_COMPARISON_FILENAME = 'weight_comparison.json'
+
+# Number of students scored between checkpoint opportunities in serial runs
+CHECKPOINT_BLOCK_SIZE = 1000
+
+# Student fields that affect a student's report or summary entries
+MANIFEST_FIELDS = ['First Name', 'Last Name', 'Email', 'GPA', 'IELTS', 'Top 10',
+                   'Extra Co-Curriculars', 'Credit Transfer Requirement']
+
+def write_student_report(student, rankings, output_dir):
+    """Save the rankings of one student to its individual JSON report"""
+    PerStudentJSONSink(output_dir).write(student.name, student, rankings)
+
+def run_info(sink_type, shards, scorer='traditional', student_data_path=STUDENT_DATA_PATH):
+    """Inputs and result settings of a run, stored with its results"""
+    return {
+        'students': input_fingerprint(student_data_path),
+        'scorer': scorer,
+        'sink_type': sink_type,
+        'shards': shards
+    }
+
+def load_run_info(output_dir):
+    """Load the run info of the last finished run, or None if there is none"""
+    run_info_path = f"{output_dir}/{RUN_INFO_FILENAME}"
+    if not os.path.exists(run_info_path):
+        return None
+    try:
+        with open(run_info_path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error reading run info {run_info_path}: {e}")
+        return None
+
+def save_summary(summary, matcher, output_dir, timer=None, info=None):
+    """Save the summary JSON, the HTML report, the catalog snapshot and the run info (if given)"""
+    if timer is None:
+        timer = StageTimer(progress_interval=None)
+    
+    summary_filename = f"{output_dir}/summary_report.json"
+    with timer.stage('summary_write'):
+        with open(summary_filename, 'w') as f:
+            json.dump(summary, f, indent=4)
+    
+    # Generate a more readable HTML report
+    with timer.stage('html', len(summary['universities'])):
+        generate_html_report(summary, output_dir)
+    
+    matcher.universities_df.to_csv(f"{output_dir}/{CATALOG_SNAPSHOT_FILENAME}", index=False)
+    if info is not None:
+        with open(f"{output_dir}/{RUN_INFO_FILENAME}", 'w') as f:
+            json.dump(info, f, indent=4)
+    
+    print(f"Summary report: {summary_filename}")
+    print(f"HTML report: {output_dir}/report.html")
+
+# Matcher of a pool worker process, loaded once per worker by _init_worker
+_worker_matcher = None
+
+def _init_worker():
+    """Load the university catalog once in each worker process"""
+    global _worker_matcher
+    _worker_matcher = UniversityMatcher(
+        student_data_path=STUDENT_DATA_PATH,
+        university_requirements_path=UNIVERSITY_REQUIREMENTS_PATH,
+        load_students=False
     )
+
+def score_block(matcher, students_df, timer, lazy_explanations=True):
+    """Parse and rank a block of students, recording the parse and score stages"""
+    engine = matcher.scoring_engine
+    with timer.stage('parse', len(students_df)):
+        features = engine.features_for(students_df)
+    with timer.stage('score', len(students_df)):
+        return engine.generate_rankings(students_df, features=features, lazy_explanations=lazy_explanations)
+
+def _process_shard(task):
+    """
+    Score a shard of students in a worker
     
-    students_df = pd.read_csv('exchange_program_dataset_updated.csv')
+    Reports are written by the worker when the sink allows it; otherwise the
+    rendered results are returned so the parent can write them in order.
     
-    # Summary statistics
-    summary = {
-        'total_students': len(students_df),
-        'universities': {},
-        'average_rankings': {},
-        'top_matches': [],
-        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }
+    Returns:
+        (partial, results, timer): SummaryTable of the shard, a list of
+            (row, student, rankings) for the parent to write (empty if the
+            worker wrote them), and the worker's StageTimer for the shard
+    """
+    students_df, write_reports, sink = task
+    timer = StageTimer(progress_interval=None)
+    partial = SummaryTable()
+    results = []
+    all_rankings = score_block(_worker_matcher, students_df, timer, lazy_explanations=sink is not None)
+    for (i, student), rankings, write_report in zip(students_df.iterrows(), all_rankings, write_reports):
+        if sink is None:
+            results.append((i, student, rankings))
+        elif write_report:
+            with timer.stage('serialize', 1):
+                sink.write(i, student, rankings)
+        with timer.stage('collect', 1):
+            partial.add(student, rankings)
+    return partial, results, timer
+
+def process_students_in_parallel(students_df, sink, workers, checkpoint, timer):
+    """
+    Score students across a process pool and merge the per-shard result tables
     
-    # Process each student
-    for i, student in students_df.iterrows():
-        student_dict = student.to_dict()
-        
-        # Generate rankings
-        rankings = matcher.generate_ranking(student_data=student_dict)
+    Students are split into contiguous shards that are merged back in order,
+    so the results and summary are byte-identical to the serial run. Stage
+    times of the workers are summed into timer.
+    
+    Args:
+        students_df: DataFrame of students
+        sink: ResultSink for the results
+        workers: Number of worker processes
+        checkpoint: BatchCheckpoint; students it already completed are skipped
+            and progress is recorded after each shard
+        timer: StageTimer for the run
         
-        # Save individual report
-        student_filename = f"{output_dir}/{student['First Name']}_{student['Last Name']}_rankings.json"
-        with open(student_filename, 'w') as f:
-            json.dump({
-                'student': {
-                    'name': f"{student['First Name']} {student['Last Name']}",
-                    'email': student['Email'],
-                    'gpa': student['GPA'],
-                    'ielts': student['IELTS']
-                },
-                'rankings': rankings
-            }, f, indent=4)
+    Returns:
+        table: SummaryTable of every student, in order
+    """
+    write_reports = [True] * len(students_df)
+    if sink.parallel_safe:
+        # Students sharing a report filename overwrite each other in the serial run;
+        # only the last one is written so concurrent shards cannot race on the file
+        filenames = [report_filename(student) for _, student in students_df.iterrows()]
+        seen = set()
+        for i in range(len(filenames) - 1, -1, -1):
+            write_reports[i] = filenames[i] not in seen
+            seen.add(filenames[i])
+    worker_sink = sink if sink.parallel_safe else None
+    
+    # A few shards per worker keeps the pool busy when shards take uneven time
+    first = checkpoint.completed
+    remaining = len(students_df) - first
+    num_shards = min(remaining, workers * 4) or 1
+    bounds = [first + remaining * k // num_shards for k in range(num_shards + 1)]
+    tasks = [
+        (students_df.iloc[start:stop], write_reports[start:stop], worker_sink)
+        for start, stop in zip(bounds[:-1], bounds[1:])
+    ]
+    
+    table = checkpoint.table
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        for stop, (partial, results, shard_timer) in zip(bounds[1:], executor.map(_process_shard, tasks)):
+            timer.merge(shard_timer)
+            for i, student, rankings in results:
+                with timer.stage('serialize', 1):
+                    sink.write(i, student, rankings)
+            with timer.stage('collect'):
+                table.extend(partial)
+            with timer.stage('checkpoint'):
+                checkpoint.update(stop, table, sink)
+            timer.progress(stop, len(students_df))
+    return table
+
+def start_checkpointed_run(output_dir, matcher, sink_type, shards, resume, checkpoint_interval,
+                           student_data_path=STUDENT_DATA_PATH, scorer='traditional'):
+    """
+    Set up the checkpoint and result sink of a batch run
+    
+    Args:
+        output_dir: Directory for the results and the checkpoint
+        matcher: Matcher whose catalog version identifies the requirements
+        sink_type: Result sink type (see SINK_TYPES)
+        shards: Subdirectory count for per-student JSON reports
+        resume: Continue from a matching checkpoint
+        checkpoint_interval: Minimum number of seconds between checkpoint writes
+        student_data_path: Student file of the run
+        scorer: Name of the scoring method, so runs of different matchers never resume each other
+    
+    Returns:
+        (checkpoint, sink): BatchCheckpoint (resumed if possible) and the
+            ResultSink positioned after the checkpointed results
+    """
+    run_key = {
+        'students': input_fingerprint(student_data_path),
+        'catalog_version': matcher.catalog.version,
+        'scorer': scorer,
+        'sink_type': sink_type,
+        'shards': shards
+    }
+    checkpoint = BatchCheckpoint.start(output_dir, run_key, resume, checkpoint_interval)
+    sink = create_sink(sink_type, output_dir, shards, checkpoint.sink_state if checkpoint.completed else None)
+    if checkpoint.completed and not sink.resumable:
+        print(f"The {sink_type} result sink cannot be resumed. Starting from the first student.")
+        checkpoint = BatchCheckpoint(output_dir, run_key, checkpoint_interval)
+    return checkpoint, sink
+
+def process_all_students(output_dir="results", chunk_size=None, workers=1, sink_type='json', shards=0,
+                         resume=False, checkpoint_interval=CHECKPOINT_INTERVAL):
+    """
+    Rank every student and write the results, summary and HTML report
+    
+    Args:
+        output_dir: Directory for the results
+        chunk_size: Stream the student file in chunks of this many rows
+        workers: Number of worker processes (ignored when streaming)
+        sink_type: Result format, one of SINK_TYPES: 'json' (one report per
+            student), 'jsonl' (single rankings.jsonl) or 'columnar' (single
+            Parquet/CSV table)
+        shards: Spread per-student JSON reports over this many subdirectories
+        resume: Continue from the checkpoint of an interrupted run
+        checkpoint_interval: Minimum number of seconds between checkpoint writes
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    if chunk_size:
+        return process_students_in_chunks(output_dir, chunk_size, sink_type, shards, resume, checkpoint_interval)
+    timer = StageTimer()
+    with timer.stage('load'):
+        matcher = UniversityMatcher(
+            student_data_path=STUDENT_DATA_PATH,
+            university_requirements_path=UNIVERSITY_REQUIREMENTS_PATH,
+            load_students=False
+        )
         
-        # Update summary statistics
-        for rank_data in rankings:
-            uni_name = rank_data['university']
-            rank = rank_data['rank']
-            
-            # Initialize university data if not exists
-            if uni_name not in summary['universities']:
-                summary['universities'][uni_name] = {
-                    'total_rankings': 0,
-                    'sum_rankings': 0,
-                    'students': []
-                }
-            
-            # Update university statistics
-            summary['universities'][uni_name]['total_rankings'] += 1
-            summary['universities'][uni_name]['sum_rankings'] += rank
-            summary['universities'][uni_name]['students'].append({
-                'name': f"{student['First Name']} {student['Last Name']}",
-                'rank': rank
-            })
+        students_df = registry.read_csv(STUDENT_DATA_PATH)
+    timer.add_items('load', len(students_df))
+    
+    checkpoint, sink = start_checkpointed_run(output_dir, matcher, sink_type, shards, resume, checkpoint_interval)
+    timer.resume(checkpoint.completed)
+    with sink:
+        if workers > 1:
+            table = process_students_in_parallel(students_df, sink, workers, checkpoint, timer)
+        else:
+            # Results table the summary statistics are aggregated from
+            table = checkpoint.table
             
-            # Add to top matches if rank is high
-            if rank >= 8:
-                summary['top_matches'].append({
-                    'student': f"{student['First Name']} {student['Last Name']}",
-                    'university': uni_name,
-                    'rank': rank
-                })
-    
-    # Calculate average rankings
-    for uni_name, data in summary['universities'].items():
-        if data['total_rankings'] > 0:
-            avg_rank = data['sum_rankings'] / data['total_rankings']
-            summary['average_rankings'][uni_name] = round(avg_rank, 1)
-    
-    # Sort top matches by rank
-    summary['top_matches'] = sorted(summary['top_matches'], key=lambda x: x['rank'], reverse=True)
-    
-    # Save summary report
-    summary_filename = f"{output_dir}/summary_report.json"
-    with open(summary_filename, 'w') as f:
-        json.dump(summary, f, indent=4)
+            # Score blocks of students at once; explanation text is rendered when each result is written
+            for start in range(checkpoint.completed, len(students_df), CHECKPOINT_BLOCK_SIZE):
+                block = students_df.iloc[start:start + CHECKPOINT_BLOCK_SIZE]
+                all_rankings = score_block(matcher, block, timer)
+                
+                # Process each student
+                for (i, student), rankings in zip(block.iterrows(), all_rankings):
+                    # Save the student's results
+                    with timer.stage('serialize', 1):
+                        sink.write(i, student, rankings)
+                    
+                    # Collect the results for the summary statistics
+                    with timer.stage('collect', 1):
+                        table.add(student, rankings)
+                
+                with timer.stage('checkpoint'):
+                    checkpoint.update(start + len(block), table, sink)
+                timer.progress(start + len(block), len(students_df))
     
-    # Generate a more readable HTML report
-    generate_html_report(summary, output_dir)
+    with timer.stage('summary'):
+        summary = table.summary()
     
     print(f"Processed {len(students_df)} students. Results saved to {output_dir}/")
-    print(f"Summary report: {summary_filename}")
-    print(f"HTML report: {output_dir}/report.html")
+    save_summary(summary, matcher, output_dir, timer, info=run_info(sink_type, shards))
+    checkpoint.remove()
+    timer.progress(len(students_df), len(students_df), force=True)
+    timer.write(f"{output_dir}/{TIMINGS_FILENAME}")
 
-def generate_html_report(summary, output_dir):
-    """Generate an HTML report from the summary data"""
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>University Exchange Program Matching Report</title>
-        <style>
-            body {{ font-family: Arial, sans-serif; margin: 20px; }}
-            h1, h2, h3 {{ color: #2c3e50; }}
-            .container {{ max-width: 1200px; margin: 0 auto; }}
-            table {{ border-collapse: collapse; width: 100%; margin-bottom: 20px; }}
-            th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-            th {{ background-color: #f2f2f2; }}
-            tr:nth-child(even) {{ background-color: #f9f9f9; }}
-            .highlight {{ background-color: #e8f4f8; }}
-            .section {{ margin-bottom: 30px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>University Exchange Program Matching Report</h1>
-            <p>Generated on: {summary['timestamp']}</p>
-            <p>Total students processed: {summary['total_students']}</p>
-            
-            <div class="section">
-                <h2>Top Matches (Rank 8 or higher)</h2>
-                <table>
-                    <tr>
-                        <th>Student</th>
-                        <th>University</th>
-                        <th>Rank</th>
-                    </tr>
-    """
-    
-    # Add top matches
-    for match in summary['top_matches'][:20]:  # Limit to top 20
-        html += f"""
-                    <tr class="highlight">
-                        <td>{match['student']}</td>
-                        <td>{match['university']}</td>
-                        <td>{match['rank']}/10</td>
-                    </tr>
-        """
-    
-    html += """
-                </table>
-            </div>
+def process_students_in_chunks(output_dir="results", chunk_size=10000, sink_type='json', shards=0,
+                               resume=False, checkpoint_interval=CHECKPOINT_INTERVAL):
+    """
+    Same results as process_all_students, but the student file is streamed in
+    chunks of chunk_size rows so it never has to fit in memory
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    timer = StageTimer()
+    with timer.stage('load'):
+        matcher = UniversityMatcher(
+            student_data_path=STUDENT_DATA_PATH,
+            university_requirements_path=UNIVERSITY_REQUIREMENTS_PATH,
+            load_students=False
+        )
+    
+    checkpoint, sink = start_checkpointed_run(output_dir, matcher, sink_type, shards, resume, checkpoint_interval)
+    timer.resume(checkpoint.completed)
+    table = checkpoint.table
+    
+    with sink:
+        for student, rankings in matcher.stream_rankings(chunk_size=chunk_size, lazy_explanations=True,
+                                                         skip_students=checkpoint.completed, timer=timer):
+            with timer.stage('serialize', 1):
+                sink.write(student.name, student, rankings)
+            with timer.stage('collect', 1):
+                table.add(student, rankings)
             
-            <div class="section">
-                <h2>University Average Rankings</h2>
-                <table>
-                    <tr>
-                        <th>University</th>
-                        <th>Average Rank</th>
-                        <th>Number of Students</th>
-                    </tr>
-    """
-    
-    # Sort universities by average ranking
-    sorted_unis = sorted(summary['average_rankings'].items(), key=lambda x: x[1], reverse=True)
-    
-    # Add university average rankings
-    for uni_name, avg_rank in sorted_unis:
-        num_students = summary['universities'][uni_name]['total_rankings']
-        html += f"""
-                    <tr>
-                        <td>{uni_name}</td>
-                        <td>{avg_rank}/10</td>
-                        <td>{num_students}</td>
-                    </tr>
-        """
-    
-    html += """
-                </table>
-            </div>
+            # Record progress at chunk boundaries
+            if len(table) % chunk_size == 0:
+                with timer.stage('checkpoint'):
+                    checkpoint.update(len(table), table, sink)
+                timer.progress(len(table))
+    
+    with timer.stage('summary'):
+        summary = table.summary()
+    
+    print(f"Processed {summary['total_students']} students. Results saved to {output_dir}/")
+    save_summary(summary, matcher, output_dir, timer, info=run_info(sink_type, shards))
+    checkpoint.remove()
+    timer.progress(len(table), force=True)
+    timer.write(f"{output_dir}/{TIMINGS_FILENAME}")
+
+def stored_rankings(summary, students_df):
+    """
+    Rebuild every student's (university, rank) pairs from a stored summary
+    
+    The summary lists each university's rankings in student order, so walking
+    the students' Top 10 lists in file order consumes those lists one entry
+    at a time.
+    
+    Returns:
+        all_rankings: List (one per student) of ranking lists in Top 10 order,
+            or None if the summary does not belong to these students
+    """
+    if summary.get('total_students') != len(students_df):
+        return None
+    entries = {uni_name: iter(data['students']) for uni_name, data in summary['universities'].items()}
+    names = (students_df['First Name'].astype(str) + ' ' + students_df['Last Name'].astype(str)).tolist()
+    
+    all_rankings = []
+    for name, top_10 in zip(names, students_df['Top 10'].tolist()):
+        rankings = []
+        for uni_name in top_10.split(', '):
+            entry = next(entries.get(uni_name, iter(())), None)
+            if entry is None or entry['name'] != name:
+                return None
+            rankings.append({'university': uni_name, 'rank': entry['rank']})
+        all_rankings.append(rankings)
+    
+    if any(next(remaining, None) is not None for remaining in entries.values()):
+        return None
+    return all_rankings
+
+def rescore_catalog_changes(output_dir="results", sink_type=None, shards=None):
+    """
+    Update stored results after university_requirements.csv was edited
+    
+    The stored ranks are read back from the previous summary. Only students
+    who listed a changed (or appended) university are rescored, and only
+    against the changed universities; the summary is rebuilt from the patched
+    ranks and the reports those students own are rewritten through the run's
+    sink. Falls back to a full run if there are no usable previous results,
+    the student file changed, universities were removed or reordered, or the
+    results are in a single-file sink that cannot be patched.
+    
+    Args:
+        output_dir: Directory of the stored results
+        sink_type: Result sink type; must match the previous run (default: its sink)
+        shards: Report subdirectory count; must match the previous run (default: its shards)
+    """
+    snapshot_path = f"{output_dir}/{CATALOG_SNAPSHOT_FILENAME}"
+    summary_filename = f"{output_dir}/summary_report.json"
+    previous = load_run_info(output_dir)
+    if previous is None or not os.path.exists(snapshot_path) or not os.path.exists(summary_filename):
+        print("No previous results to update. Running a full batch instead.")
+        return process_all_students(output_dir, sink_type=sink_type or 'json', shards=shards or 0)
+    
+    if (sink_type is not None and sink_type != previous['sink_type']) or (shards is not None and shards != previous['shards']):
+        print(f"Stored results were written with --sink {previous['sink_type']} --shards {previous['shards']}. "
+              f"Update them with the same settings, or run a full batch to change them.")
+        return
+    if previous['scorer'] != 'traditional':
+        print(f"Stored results were scored with the {previous['scorer']} matcher. "
+              f"Only traditional results can be updated.")
+        return
+    sink_type = previous['sink_type']
+    shards = previous['shards']
+    
+    if previous['students'] != input_fingerprint(STUDENT_DATA_PATH):
+        print("The student file changed since the last run. Running a full batch instead.")
+        return process_all_students(output_dir, sink_type=sink_type, shards=shards)
+    if sink_type != 'json':
+        print(f"The {sink_type} sink stores all results in one file, which cannot be patched. "
+              f"Running a full batch instead.")
+        return process_all_students(output_dir, sink_type=sink_type, shards=shards)
+    
+    matcher = UniversityMatcher(
+        student_data_path=STUDENT_DATA_PATH,
+        university_requirements_path=UNIVERSITY_REQUIREMENTS_PATH,
+        load_students=False
+    )
+    changes = diff_catalogs(pd.read_csv(snapshot_path), matcher.universities_df)
+    if changes is None:
+        print("Universities were removed or reordered. Running a full batch instead.")
+        return process_all_students(output_dir, sink_type=sink_type, shards=shards)
+    if not changes:
+        print("No university requirement changes found.")
+        return
+    
+    students_df = registry.read_csv(STUDENT_DATA_PATH)
+    with open(summary_filename) as f:
+        all_rankings = stored_rankings(json.load(f), students_df)
+    if all_rankings is None:
+        print("Stored summary does not match the student file. Running a full batch instead.")
+        return process_all_students(output_dir, sink_type=sink_type, shards=shards)
+    
+    changed_positions = sorted(changes)
+    changed_columns = {position: column for column, position in enumerate(changed_positions)}
+    catalog = matcher.catalog
+    changed_universities = {matcher.universities_df['University Name'].iat[position] for position in changed_positions}
+    print(f"Rescoring {len(changed_universities)} changed universities: {', '.join(sorted(changed_universities))}")
+    
+    # Students who listed a changed university, scored against the changed universities only
+    affected = [
+        row for row, rankings in enumerate(all_rankings)
+        if any(catalog.position(rank_data['university']) in changed_columns for rank_data in rankings)
+    ]
+    engine = matcher.scoring_engine
+    features = engine.features_for(students_df.iloc[affected])
+    new_ranks = engine.to_ranks(engine.weighted_scores(engine.score_components(features, np.array(changed_positions))))
+    for a, row in enumerate(affected):
+        for rank_data in all_rankings[row]:
+            column = changed_columns.get(catalog.position(rank_data['university']))
+            if column is not None:
+                rank_data['rank'] = int(new_ranks[a, column])
+    
+    # The last student with a given report filename owns the file, as in a full run
+    students = students_df[MANIFEST_FIELDS].to_dict('records')
+    report_owners = {}
+    for row, student in enumerate(students):
+        report_owners[report_filename(student)] = row
+    reports_to_write = [row for row in affected if report_owners[report_filename(students[row])] == row]
+    
+    # Reports need every ranking's explanation, so their owners get full rankings
+    report_rankings = dict(zip(
+        reports_to_write,
+        engine.generate_rankings(students_df.iloc[reports_to_write], lazy_explanations=True)
+    ))
+    
+    table = SummaryTable()
+    with create_sink(sink_type, output_dir, shards) as sink:
+        for row, student in enumerate(students):
+            rankings = report_rankings.get(row)
+            if rankings is None:
+                rankings = sorted(all_rankings[row], key=lambda x: x['rank'], reverse=True)
+            else:
+                sink.write(row, student, rankings)
+            table.add(student, rankings)
+    
+    summary = table.summary()
+    
+    print(f"Rescored {len(affected)} of {len(students)} students and updated {len(reports_to_write)} "
+          f"reports in {output_dir}/")
+    save_summary(summary, matcher, output_dir, info=run_info(sink_type, shards))
+
+def student_hash(student):
+    """Content hash of the fields a student's results depend on"""
+    values = [normalize_value(student[field]) for field in MANIFEST_FIELDS]
+    return hashlib.sha1(json.dumps(values).encode('utf-8')).hexdigest()
+
+def load_manifest(output_dir):
+    """Load the manifest of the previous incremental run, or None if there is none"""
+    manifest_path = f"{output_dir}/{MANIFEST_FILENAME}"
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error reading manifest {manifest_path}: {e}")
+        return None
+
+# Sinks an incremental run can update: per-student reports can be rewritten
+# one at a time, while single-file sinks would need every student's rankings
+INCREMENTAL_SINK_TYPES = ['json']
+
+def process_changed_students(output_dir="results", sink_type='json', shards=0):
+    """
+    Incremental run: score only students that are new or changed since the last run
+    
+    The manifest stores, per student content hash, the (university, rank)
+    pairs of its rankings, plus the catalog version, the report shards and
+    which student each report file was written for. Students whose hash is
+    already in the manifest reuse the stored pairs, and the summary is
+    rebuilt from them in student order, so the results match a full run. If
+    the catalog changed, every student is rescored; if the shards changed,
+    every report is rewritten.
+    
+    Args:
+        output_dir: Directory for the results
+        sink_type: Result sink type, one of INCREMENTAL_SINK_TYPES
+        shards: Spread per-student JSON reports over this many subdirectories
+    """
+    if sink_type not in INCREMENTAL_SINK_TYPES:
+        raise ValueError(f"Incremental runs cannot update the {sink_type} sink")
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    matcher = UniversityMatcher(
+        student_data_path=STUDENT_DATA_PATH,
+        university_requirements_path=UNIVERSITY_REQUIREMENTS_PATH,
+        load_students=False
+    )
+    students_df = registry.read_csv(STUDENT_DATA_PATH)
+    catalog_version = matcher.catalog.version
+    
+    manifest = load_manifest(output_dir)
+    if manifest is None:
+        print("No manifest found. Scoring every student.")
+        manifest = {'catalog_version': catalog_version, 'shards': shards, 'students': {}, 'reports': {}}
+    elif manifest['catalog_version'] != catalog_version:
+        print("University requirements changed since the last run. Scoring every student.")
+        manifest = {'catalog_version': catalog_version, 'shards': shards, 'students': {}, 'reports': {}}
+    elif manifest.get('shards', 0) != shards:
+        print("Report shards changed since the last run. Rewriting every report.")
+        manifest['reports'] = {}
+    stored = manifest['students']
+    
+    students = students_df[MANIFEST_FIELDS].to_dict('records')
+    hashes = [student_hash(student) for student in students]
+    
+    # The last student with a given report filename owns the file, as in a full run
+    report_owners = {}
+    for row, student in enumerate(students):
+        report_owners[report_filename(student)] = row
+    stale_reports = {
+        row for filename, row in report_owners.items()
+        if manifest['reports'].get(filename) != hashes[row]
+    }
+    
+    rows_to_score = sorted({row for row, h in enumerate(hashes) if h not in stored} | stale_reports)
+    all_rankings = matcher.generate_all_rankings(students_df.iloc[rows_to_score], lazy_explanations=True)
+    new_rankings = dict(zip(rows_to_score, all_rankings))
+    
+    table = SummaryTable()
+    students_manifest = {}
+    with create_sink(sink_type, output_dir, shards) as sink:
+        for row, student in enumerate(students):
+            rankings = new_rankings.get(row)
+            if rankings is None:
+                rankings = [{'university': uni_name, 'rank': rank} for uni_name, rank in stored[hashes[row]]]
+            elif row in stale_reports:
+                sink.write(row, student, rankings)
             
-            <div class="section">
-                <h2>University Details</h2>
-    """
-    
-    # Add university details
-    for uni_name, data in summary['universities'].items():
-        html += f"""
-                <h3>{uni_name}</h3>
-                <p>Average Rank: {summary['average_rankings'].get(uni_name, 'N/A')}/10</p>
-                <p>Number of Students: {data['total_rankings']}</p>
-                <table>
-                    <tr>
-                        <th>Student</th>
-                        <th>Rank</th>
-                    </tr>
-        """
-        
-        # Sort students by rank
-        sorted_students = sorted(data['students'], key=lambda x: x['rank'], reverse=True)
-        
-        for student in sorted_students:
-            html += f"""
-                    <tr>
-                        <td>{student['name']}</td>
-                        <td>{student['rank']}/10</td>
-                    </tr>
-            """
-        
-        html += """
-                </table>
-        """
+            table.add(student, rankings)
+            students_manifest[hashes[row]] = [[r['university'], r['rank']] for r in rankings]
+    
+    summary = table.summary()
+    
+    manifest = {
+        'catalog_version': catalog_version,
+        'shards': shards,
+        'students': students_manifest,
+        'reports': {filename: hashes[row] for filename, row in report_owners.items()}
+    }
+    with open(f"{output_dir}/{MANIFEST_FILENAME}", 'w') as f:
+        json.dump(manifest, f)
+    
+    print(f"Scored {len(rows_to_score)} new or changed students, reused {len(students) - len(rows_to_score)} "
+          f"stored results. Results saved to {output_dir}/")
+    save_summary(summary, matcher, output_dir, info=run_info(sink_type, shards))
+
+def compare_weightings(weights_path, output_dir="results"):
+    """
+    Rank the whole cohort under several weighting schemes and write a comparison
     
-    html += """
-            </div>
-        </div>
-    </body>
-    </html>
+    Every scheme is applied to the stored component scores in one matrix
+    product (see UniversityMatcher.compare_weightings), so no pair is rescored.
+    The current field weights are included as the "current" scheme. For each
+    scheme the comparison lists the average rank of the students' Top 10
+    choices, the average rank per university among the students who listed
+    it, and how many students get a different best-ranked choice than with
+    the current weights.
+    
+    Args:
+        weights_path: JSON file mapping scheme names to weight dictionaries with
+            the keys gpa, ielts, extracurriculars and credit_transfer
+        output_dir: Directory to write weight_comparison.json to
     """
+    with open(weights_path) as f:
+        weight_sets = json.load(f)
+    if not isinstance(weight_sets, dict) or not weight_sets:
+        print(f"{weights_path} must map scheme names to weight dictionaries.")
+        return
+    
+    matcher = UniversityMatcher(
+        student_data_path=STUDENT_DATA_PATH,
+        university_requirements_path=UNIVERSITY_REQUIREMENTS_PATH
+    )
+    schemes = {'current': dict(matcher.field_weights)}
+    schemes.update(weight_sets)
+    missing = {name: sorted(set(matcher.field_weights) - set(weights)) for name, weights in schemes.items()}
+    missing = {name: keys for name, keys in missing.items() if keys}
+    if missing:
+        for name, keys in missing.items():
+            print(f"Scheme {name} is missing the weights: {', '.join(keys)}")
+        return
+    
+    ranks = matcher.compare_weightings(list(schemes.values()))
+    
+    # (student, university) pairs of every listed university found in the catalog, in Top 10 order
+    catalog = matcher.catalog
+    rows, columns = [], []
+    for row, top_10 in enumerate(matcher.students_df['Top 10'].tolist()):
+        for uni_name in top_10.split(', '):
+            position = catalog.position(uni_name)
+            if position is not None:
+                rows.append(row)
+                columns.append(position)
+    rows = np.array(rows, dtype=np.int64)
+    columns = np.array(columns, dtype=np.int64)
+    pair_ranks = ranks[:, rows, columns]
     
-    # Save HTML report
-    with open(f"{output_dir}/report.html", 'w') as f:
-        f.write(html)
+    # First best-ranked pair of each student, like the order of generate_ranking
+    students, starts = np.unique(rows, return_index=True)
+    num_universities = len(matcher.universities_df)
+    listed = np.bincount(columns, minlength=num_universities)
+    university_names = matcher.universities_df['University Name'].tolist()
+    
+    comparison = {'students': len(matcher.students_df), 'schemes': {}}
+    current_choices = None
+    for s, (name, weights) in enumerate(schemes.items()):
+        scheme_ranks = pair_ranks[s]
+        best = np.maximum.reduceat(scheme_ranks, starts) if len(starts) else scheme_ranks
+        is_best = scheme_ranks == np.repeat(best, np.diff(np.append(starts, len(rows))))
+        _, first_best = np.unique(rows[is_best], return_index=True)
+        choices = columns[np.flatnonzero(is_best)[first_best]]
+        if current_choices is None:
+            current_choices = choices
+        
+        rank_sums = np.bincount(columns, weights=scheme_ranks, minlength=num_universities)
+        comparison['schemes'][name] = {
+            'weights': weights,
+            'average_rank': round(float(scheme_ranks.mean()), 3) if len(scheme_ranks) else 0,
+            'changed_top_choice': int((choices != current_choices).sum()),
+            'universities': {
+                university_names[u]: round(float(rank_sums[u] / listed[u]), 3)
+                for u in range(num_universities) if listed[u] and catalog.position(university_names[u]) == u
+            }
+        }
+    
+    os.makedirs(output_dir, exist_ok=True)
+    with open(f"{output_dir}/{WEIGHT_COMPARISON_FILENAME}", 'w') as f:
+        json.dump(comparison, f, indent=2)
+    
+    print(f"Compared {len(schemes)} weighting schemes over {len(students)} of {len(matcher.students_df)} students "
+          f"(the others list no university in the catalog). "
+          f"Results saved to {output_dir}/{WEIGHT_COMPARISON_FILENAME}")
+
+def generate_html_report(summary, output_dir, page_size=500):
+    """Generate the HTML report (report.html plus paginated university pages) from the summary data"""
+    write_html_report(summary, output_dir, page_size)
 
 if __name__ == "__main__":
-    process_all_students()
+    parser = argparse.ArgumentParser(description="Generate university rankings for every student in the dataset")
+    parser.add_argument('--output-dir', default='results', help="Directory for the reports")
+    parser.add_argument('--catalog-update', action='store_true',
+                        help="Only rescore universities whose requirements changed since the last run")
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help="Stream the student file in chunks of this many rows instead of loading it at once")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of worker processes to score students in parallel")
+    parser.add_argument('--sink', choices=SINK_TYPES, default=None,
+                        help="Result format: one JSON report per student (default), a single JSONL file, "
+                             "or a single columnar (Parquet/CSV) table")
+    parser.add_argument('--shards', type=int, default=None,
+                        help="Spread per-student JSON reports over this many subdirectories")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only score students that are new or changed since the last incremental run")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue an interrupted run from its last checkpoint")
+    parser.add_argument('--checkpoint-interval', type=float, default=CHECKPOINT_INTERVAL,
+                        help="Minimum number of seconds between checkpoints")
+    parser.add_argument('--compare-weightings', metavar='WEIGHTS_JSON', default=None,
+                        help="Instead of writing reports, rank the cohort under the weighting schemes in this "
+                             "JSON file ({\"name\": {\"gpa\": ..., \"ielts\": ..., \"extracurriculars\": ..., "
+                             "\"credit_transfer\": ...}}) and write a comparison")
+    args = parser.parse_args()
+    
+    if args.compare_weightings is not None:
+        ignored = [flag for flag, used in [('--catalog-update', args.catalog_update), ('--incremental', args.incremental),
+                                           ('--chunk-size', args.chunk_size), ('--workers', args.workers != 1),
+                                           ('--sink', args.sink), ('--shards', args.shards),
+                                           ('--resume', args.resume)] if used]
+        if ignored:
+            parser.error(f"--compare-weightings cannot be combined with {', '.join(ignored)}")
+    
+    if args.catalog_update or args.incremental:
+        mode = '--catalog-update' if args.catalog_update else '--incremental'
+        ignored = [flag for flag, used in [('--incremental', args.catalog_update and args.incremental),
+                                           ('--chunk-size', args.chunk_size), ('--workers', args.workers != 1),
+                                           ('--resume', args.resume)] if used]
+        if ignored:
+            parser.error(f"{mode} cannot be combined with {', '.join(ignored)}")
+    
+    if args.compare_weightings is not None:
+        compare_weightings(args.compare_weightings, args.output_dir)
+    elif args.catalog_update:
+        rescore_catalog_changes(args.output_dir, sink_type=args.sink, shards=args.shards)
+    elif args.incremental:
+        if args.sink is not None and args.sink not in INCREMENTAL_SINK_TYPES:
+            parser.error(f"--incremental only supports --sink {', '.join(INCREMENTAL_SINK_TYPES)}")
+        process_changed_students(args.output_dir, sink_type=args.sink or 'json', shards=args.shards or 0)
+    else:
+        process_all_students(args.output_dir, chunk_size=args.chunk_size, workers=args.workers,
+                             sink_type=args.sink or 'json', shards=args.shards or 0, resume=args.resume,
+                             checkpoint_interval=args.checkpoint_interval)
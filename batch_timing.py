@@ -0,0 +1,122 @@
+import json
+import time
+from contextlib import contextmanager
+
+# Minimum number of seconds between two live progress lines
+PROGRESS_INTERVAL = 5.0
+
+TIMINGS_FILENAME = 'timings.json'
+
+
+class StageTimer:
+    """
+    Wall time and item counts per batch stage, with live throughput reporting.
+
+    Stages can be entered many times (e.g. once per block of students); their
+    times and item counts accumulate. Timers of pool workers can be merged
+    into the parent's timer, in which case stage times are summed across
+    workers while the total is the parent's wall time.
+    """
+
+    def __init__(self, progress_interval=PROGRESS_INTERVAL):
+        """
+        Args:
+            progress_interval: Minimum number of seconds between progress lines
+                (None to disable live progress)
+        """
+        self.progress_interval = progress_interval
+        self.stages = {}
+        self.students = 0
+        self.resumed_from = 0
+        self._started = time.perf_counter()
+        self._last_progress = self._started
+
+    @contextmanager
+    def stage(self, name, items=0):
+        """Time the enclosed block as part of a stage that processed `items` items"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, items)
+
+    def record(self, name, seconds, items=0, calls=1):
+        """Add time and items to a stage"""
+        stage = self.stages.setdefault(name, {'seconds': 0.0, 'items': 0, 'calls': 0})
+        stage['seconds'] += seconds
+        stage['items'] += items
+        stage['calls'] += calls
+
+    def add_items(self, name, items):
+        """Add items to a stage without adding time (e.g. once the item count is known)"""
+        self.record(name, 0.0, items, calls=0)
+
+    def merge(self, other):
+        """Add the stage totals of another timer (e.g. returned by a pool worker)"""
+        for name, stage in other.stages.items():
+            self.record(name, stage['seconds'], stage['items'], stage['calls'])
+
+    def resume(self, completed):
+        """
+        Note the students completed by an earlier run that this run resumes
+
+        They count towards the progress shown, but not towards the throughput
+        of this run.
+        """
+        self.resumed_from = completed
+        self.students = 0
+
+    def elapsed(self):
+        """Seconds since the timer was created"""
+        return time.perf_counter() - self._started
+
+    def progress(self, completed, total=None, force=False):
+        """
+        Print the number of completed students and the throughput so far
+
+        Args:
+            completed: Number of students completed, including those of a resumed run
+            total: Total number of students, if known
+            force: Print even if the progress interval has not passed
+        """
+        self.students = completed - self.resumed_from
+        if self.progress_interval is None:
+            return
+        now = time.perf_counter()
+        if not force and now - self._last_progress < self.progress_interval:
+            return
+        self._last_progress = now
+
+        elapsed = now - self._started
+        rate = self.students / elapsed if elapsed > 0 else 0.0
+        of_total = f"/{total}" if total is not None else ""
+        print(f"Processed {completed}{of_total} students ({rate:.1f} students/sec)")
+
+    def summary(self):
+        """Machine-readable timing summary"""
+        total_seconds = self.elapsed()
+        stages = {}
+        for name, stage in self.stages.items():
+            stages[name] = {
+                'seconds': round(stage['seconds'], 6),
+                'items': stage['items'],
+                'calls': stage['calls'],
+                'items_per_second': round(stage['items'] / stage['seconds'], 3) if stage['seconds'] > 0 else None
+            }
+        return {
+            'total_seconds': round(total_seconds, 6),
+            'students': self.students,
+            'resumed_from': self.resumed_from,
+            'students_per_second': round(self.students / total_seconds, 3) if total_seconds > 0 else None,
+            'stages': stages
+        }
+
+    def write(self, path):
+        """Write the timing summary as JSON and print a one-line overview"""
+        summary = self.summary()
+        with open(path, 'w') as f:
+            json.dump(summary, f, indent=4)
+
+        stage_times = ", ".join(f"{name} {stage['seconds']:.2f}s" for name, stage in summary['stages'].items())
+        print(f"Timings: {summary['total_seconds']:.2f}s total ({stage_times}). Saved to {path}")
+        return summary
@@ -0,0 +1,89 @@
+import os
+import threading
+
+import pandas as pd
+
+from university_catalog import UniversityCatalog
+
+
+def file_signature(path):
+    """Size and modification time of a file, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+class DatasetRegistry:
+    """
+    Process-wide cache of loaded datasets and the objects built from them.
+
+    Each dataset is loaded once per process and shared by every caller.
+    Entries remember the size and modification time of their source files and
+    are reloaded on the first lookup after a file changed. DataFrames are
+    handed out as shallow copies: with pandas copy-on-write (the default from
+    pandas 3) a caller modifying its copy never changes the shared data.
+    """
+
+    def __init__(self):
+        self.loads = 0
+        self.hits = 0
+
+        self._entries = {}
+        self._lock = threading.RLock()
+
+    def get(self, key, loader, paths=()):
+        """
+        Return the shared object for a key, loading it on first use
+
+        Args:
+            key: Hashable key identifying the object
+            loader: Function called without arguments to build the object
+            paths: Files the object is built from; it is rebuilt when one of them changes
+
+        Returns:
+            value: The shared object
+        """
+        signature = [file_signature(path) for path in paths]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                return entry[1]
+
+            value = loader()
+            self._entries[key] = (signature, value)
+            self.loads += 1
+            return value
+
+    def read_csv(self, path, **kwargs):
+        """Shared DataFrame of a CSV file, read with pd.read_csv(path, **kwargs)"""
+        key = ('csv', os.path.abspath(path), repr(sorted(kwargs.items())))
+        return self.get(key, lambda: pd.read_csv(path, **kwargs), [path]).copy(deep=False)
+
+    def frame(self, name, records):
+        """Shared DataFrame built from in-memory records (e.g. the sample data lists)"""
+        return self.get(('frame', name, id(records)), lambda: pd.DataFrame(records)).copy(deep=False)
+
+    def catalog(self, path):
+        """Shared UniversityCatalog of a university requirements CSV file"""
+        return self.get(('catalog', os.path.abspath(path)), lambda: UniversityCatalog(self.read_csv(path)), [path])
+
+    def clear(self):
+        """Drop every loaded dataset"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Load/hit counters and number of loaded datasets"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'loads': self.loads,
+                'hits': self.hits
+            }
+
+
+# Registry shared by every module of the process
+registry = DatasetRegistry()
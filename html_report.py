@@ -0,0 +1,194 @@
+import glob
+import os
+from html import escape
+
+# Subdirectory of the output directory holding the per-university pages
+PAGES_DIRNAME = 'report_pages'
+
+STYLE = """
+        <style>
+            body { font-family: Arial, sans-serif; margin: 20px; }
+            h1, h2, h3 { color: #2c3e50; }
+            .container { max-width: 1200px; margin: 0 auto; }
+            table { border-collapse: collapse; width: 100%; margin-bottom: 20px; }
+            th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+            th { background-color: #f2f2f2; }
+            tr:nth-child(even) { background-color: #f9f9f9; }
+            .highlight { background-color: #e8f4f8; }
+            .section { margin-bottom: 30px; }
+            .pagination a { margin-right: 10px; }
+        </style>
+"""
+
+
+def page_filename(uni_number, page):
+    """File name of one page of a university's student list"""
+    return f"university_{uni_number:04d}_page_{page:04d}.html"
+
+
+def write_page_start(f, title):
+    """Write the document head and open the container"""
+    f.write(f"""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>{escape(title)}</title>{STYLE}</head>
+<body>
+    <div class="container">
+""")
+
+
+def write_page_end(f):
+    """Close the container and the document"""
+    f.write("""    </div>
+</body>
+</html>
+""")
+
+
+def write_html_report(summary, output_dir, page_size=500):
+    """
+    Write the HTML report section by section without building it in memory
+
+    report.html holds the aggregates (top matches, average rankings and a
+    per-university overview). The students of each university are listed on
+    separate pages of at most page_size rows under report_pages/, linked
+    from the overview, so the index stays small for any cohort size.
+
+    Args:
+        summary: Finalized summary statistics
+        output_dir: Directory for report.html and report_pages/
+        page_size: Maximum number of students per university page
+    """
+    pages_dir = os.path.join(output_dir, PAGES_DIRNAME)
+    os.makedirs(pages_dir, exist_ok=True)
+    # Pages of a previous run could otherwise be linked to stale data
+    for stale_page in glob.glob(os.path.join(pages_dir, 'university_*_page_*.html')):
+        os.remove(stale_page)
+
+    with open(os.path.join(output_dir, 'report.html'), 'w') as f:
+        write_page_start(f, "University Exchange Program Matching Report")
+        f.write(f"""        <h1>University Exchange Program Matching Report</h1>
+        <p>Generated on: {escape(summary['timestamp'])}</p>
+        <p>Total students processed: {summary['total_students']}</p>
+
+        <div class="section">
+            <h2>Top Matches (Rank 8 or higher)</h2>
+            <table>
+                <tr>
+                    <th>Student</th>
+                    <th>University</th>
+                    <th>Rank</th>
+                </tr>
+""")
+        for match in summary['top_matches'][:20]:  # Limit to top 20
+            f.write(f"""                <tr class="highlight">
+                    <td>{escape(match['student'])}</td>
+                    <td>{escape(match['university'])}</td>
+                    <td>{match['rank']}/10</td>
+                </tr>
+""")
+
+        f.write("""            </table>
+        </div>
+
+        <div class="section">
+            <h2>University Average Rankings</h2>
+            <table>
+                <tr>
+                    <th>University</th>
+                    <th>Average Rank</th>
+                    <th>Number of Students</th>
+                </tr>
+""")
+        sorted_unis = sorted(summary['average_rankings'].items(), key=lambda x: x[1], reverse=True)
+        for uni_name, avg_rank in sorted_unis:
+            f.write(f"""                <tr>
+                    <td>{escape(uni_name)}</td>
+                    <td>{avg_rank}/10</td>
+                    <td>{summary['universities'][uni_name]['total_rankings']}</td>
+                </tr>
+""")
+
+        f.write("""            </table>
+        </div>
+
+        <div class="section">
+            <h2>University Details</h2>
+            <table>
+                <tr>
+                    <th>University</th>
+                    <th>Average Rank</th>
+                    <th>Number of Students</th>
+                    <th>Students</th>
+                </tr>
+""")
+        for uni_number, (uni_name, data) in enumerate(summary['universities'].items()):
+            num_pages = write_university_pages(pages_dir, uni_number, uni_name, data, summary, page_size)
+            # Only the first page is linked so the index stays small; pages link to each other
+            link = f'<a href="{PAGES_DIRNAME}/{page_filename(uni_number, 1)}">View students</a>'
+            if num_pages > 1:
+                link += f" ({num_pages} pages)"
+            f.write(f"""                <tr>
+                    <td>{escape(uni_name)}</td>
+                    <td>{summary['average_rankings'].get(uni_name, 'N/A')}/10</td>
+                    <td>{data['total_rankings']}</td>
+                    <td>{link}</td>
+                </tr>
+""")
+
+        f.write("""            </table>
+        </div>
+""")
+        write_page_end(f)
+
+
+def write_university_pages(pages_dir, uni_number, uni_name, data, summary, page_size):
+    """
+    Write the paginated student list of one university
+
+    Returns:
+        num_pages: Number of pages written (at least one)
+    """
+    # Sort students by rank
+    sorted_students = sorted(data['students'], key=lambda x: x['rank'], reverse=True)
+    num_pages = max(1, -(-len(sorted_students) // page_size))
+
+    for page in range(1, num_pages + 1):
+        with open(os.path.join(pages_dir, page_filename(uni_number, page)), 'w') as f:
+            write_page_start(f, f"{uni_name} - page {page} of {num_pages}")
+            f.write(f"""        <h1>{escape(uni_name)}</h1>
+        <p>Average Rank: {summary['average_rankings'].get(uni_name, 'N/A')}/10</p>
+        <p>Number of Students: {data['total_rankings']}</p>
+""")
+            write_pagination(f, uni_number, page, num_pages)
+            f.write("""        <table>
+            <tr>
+                <th>Student</th>
+                <th>Rank</th>
+            </tr>
+""")
+            for student in sorted_students[(page - 1) * page_size:page * page_size]:
+                f.write(f"""            <tr>
+                <td>{escape(student['name'])}</td>
+                <td>{student['rank']}/10</td>
+            </tr>
+""")
+            f.write("""        </table>
+""")
+            write_pagination(f, uni_number, page, num_pages)
+            write_page_end(f)
+
+    return num_pages
+
+
+def write_pagination(f, uni_number, page, num_pages):
+    """Write the links back to the report and to neighbouring pages"""
+    links = ['<a href="../report.html">Back to report</a>']
+    if page > 1:
+        links.append(f'<a href="{page_filename(uni_number, page - 1)}">Previous</a>')
+    links.append(f"Page {page} of {num_pages}")
+    if page < num_pages:
+        links.append(f'<a href="{page_filename(uni_number, page + 1)}">Next</a>')
+    f.write(f"""        <p class="pagination">{' '.join(links)}</p>
+""")
@@ -0,0 +1,78 @@
+class MatchExplanation:
+    """
+    Lightweight handle for the explanation of a student/university match.
+
+    Holds the numeric component scores and everything needed to build the
+    explanation text, but only renders the text the first time it is asked
+    for (``str()``, ``render()`` or JSON serialization via
+    ``render_explanation``).
+    """
+
+    __slots__ = ('components', '_render', '_args', '_text')
+
+    def __init__(self, render, args, components):
+        """
+        Args:
+            render: Function returning the explanation text when called with args
+            args: Tuple of arguments for render
+            components: Dictionary of numeric component scores for the match
+        """
+        self.components = components
+        self._render = render
+        self._args = args
+        self._text = None
+
+    def render(self):
+        """Build (once) and return the explanation text"""
+        if self._text is None:
+            self._text = self._render(*self._args)
+            self._render = self._args = None
+        return self._text
+
+    def __str__(self):
+        return self.render()
+
+    def __repr__(self):
+        state = 'rendered' if self._text is not None else 'pending'
+        return f"<MatchExplanation {state}>"
+
+    def __eq__(self, other):
+        if isinstance(other, MatchExplanation):
+            return self.render() == other.render()
+        if isinstance(other, str):
+            return self.render() == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.render())
+
+
+def render_explanation(obj):
+    """``default=`` hook for json.dump/json.dumps that renders explanation handles"""
+    if isinstance(obj, MatchExplanation):
+        return obj.render()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def finalize_explanations(rankings, lazy_explanations=False, explain_top_k=None):
+    """
+    Apply the explanation mode to a sorted list of rankings (in place)
+
+    Args:
+        rankings: Rankings sorted best first, with MatchExplanation handles
+        lazy_explanations: Keep handles instead of rendering text now
+        explain_top_k: Only keep explanations for the first K rankings; the
+            rest get None and their text is never built
+
+    Returns:
+        rankings: The same list
+    """
+    for position, ranking in enumerate(rankings):
+        explanation = ranking['explanation']
+        if not isinstance(explanation, MatchExplanation):
+            continue
+        if explain_top_k is not None and position >= explain_top_k:
+            ranking['explanation'] = None
+        elif not lazy_explanations:
+            ranking['explanation'] = explanation.render()
+    return rankings
@@ -0,0 +1,180 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Prefix of every exported metric name
+METRIC_PREFIX = 'exchange_'
+
+# Metric families recorded during matching: name -> (type, help)
+METRIC_FAMILIES = {
+    'http_requests_total': ('counter', 'HTTP requests handled, by method, route and status'),
+    'http_request_duration_seconds': ('histogram', 'HTTP request latency by route, until the response body is sent'),
+    'stage_duration_seconds': ('histogram', 'Time spent per matching stage: catalog_lookup, traditional_scoring, llm_call, fallback'),
+    'llm_requests_total': ('counter', 'LLM analysis requests sent'),
+    'llm_errors_total': ('counter', 'LLM analysis requests that failed'),
+    'llm_fallbacks_total': ('counter', 'Analyses scored traditionally instead of by the LLM, by reason (error, deadline)')
+}
+
+# Counters without labels, exported as 0 before their first increment
+UNLABELLED_COUNTERS = ('llm_requests_total', 'llm_errors_total')
+
+
+def format_labels(labels):
+    """Prometheus label set of a sorted (name, value) tuple, e.g. {route="/api/match"}"""
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def format_value(value):
+    """Prometheus sample value"""
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class Histogram:
+    """Latency histogram with fixed bucket bounds"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        """Add one observation"""
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def samples(self, name, labels):
+        """Prometheus sample lines of the histogram, with cumulative bucket counts"""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(float(bound))
+            lines.append(f'{name}_bucket{format_labels(labels + (("le", le),))} {cumulative}')
+        lines.append(f'{name}_sum{format_labels(labels)} {format_value(self.sum)}')
+        lines.append(f'{name}_count{format_labels(labels)} {self.count}')
+        return lines
+
+
+class PipelineMetrics:
+    """
+    Process-wide request, stage and LLM metrics, rendered in the Prometheus text format.
+
+    Counters and histograms are kept per label set and only ever grow, so
+    rates (e.g. LLM errors per second) are derived by the scraper. The
+    matchers record their stages and LLM outcomes here whether they run in
+    the API server or in a batch run.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        Args:
+            buckets: Upper bounds in seconds of the latency histogram buckets
+        """
+        self.buckets = buckets
+
+        self._counters = {name: {} for name, (kind, _) in METRIC_FAMILIES.items() if kind == 'counter'}
+        self._histograms = {name: {} for name, (kind, _) in METRIC_FAMILIES.items() if kind == 'histogram'}
+        self._lock = threading.Lock()
+        self.reset()
+
+    def increment(self, name, amount=1, **labels):
+        """Add to a counter"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            samples = self._counters[name]
+            samples[key] = samples.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        """Add an observation to a histogram"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            samples = self._histograms[name]
+            histogram = samples.get(key)
+            if histogram is None:
+                histogram = samples[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def observe_request(self, method, route, status, seconds):
+        """Count an HTTP request and add its latency"""
+        self.increment('http_requests_total', method=method, route=route, status=status)
+        self.observe('http_request_duration_seconds', seconds, route=route)
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as part of a matching stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('stage_duration_seconds', time.perf_counter() - start, stage=name)
+
+    def counter_total(self, name):
+        """Sum of a counter over all its label sets"""
+        with self._lock:
+            return sum(self._counters[name].values())
+
+    def reset(self):
+        """Drop every recorded sample"""
+        with self._lock:
+            for samples in list(self._counters.values()) + list(self._histograms.values()):
+                samples.clear()
+            for name in UNLABELLED_COUNTERS:
+                self._counters[name][()] = 0
+
+    def render(self, extra=()):
+        """
+        Render every metric in the Prometheus text exposition format
+
+        Args:
+            extra: (name, type, help, value) tuples of metrics owned by the
+                caller, such as cache statistics read at scrape time
+
+        Returns:
+            text: The exposition text, ending with a newline
+        """
+        llm_requests = self.counter_total('llm_requests_total')
+        ratios = [
+            ('llm_error_ratio', 'gauge', 'Share of LLM analysis requests that failed',
+             self.counter_total('llm_errors_total') / llm_requests if llm_requests else 0.0),
+            ('llm_fallback_ratio', 'gauge', 'Share of LLM analysis requests replaced by traditional scoring',
+             self.counter_total('llm_fallbacks_total') / llm_requests if llm_requests else 0.0)
+        ]
+
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in METRIC_FAMILIES.items():
+                full_name = METRIC_PREFIX + name
+                lines.append(f'# HELP {full_name} {help_text}')
+                lines.append(f'# TYPE {full_name} {kind}')
+                if kind == 'counter':
+                    for labels, value in sorted(self._counters[name].items()):
+                        lines.append(f'{full_name}{format_labels(labels)} {format_value(value)}')
+                else:
+                    for labels, histogram in sorted(self._histograms[name].items()):
+                        lines.extend(histogram.samples(full_name, labels))
+
+        for name, kind, help_text, value in ratios + list(extra):
+            full_name = METRIC_PREFIX + name
+            lines.append(f'# HELP {full_name} {help_text}')
+            lines.append(f'# TYPE {full_name} {kind}')
+            lines.append(f'{full_name} {format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+# Metrics shared by every module of the process
+metrics = PipelineMetrics()
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Student fields that affect the rankings of the traditional matcher
+SCORING_FIELDS = ['GPA', 'IELTS', 'Top 10', 'Extra Co-Curriculars', 'Credit Transfer Requirement']
+
+# Fields the matchers read with float(), so '3.5' and 3.5 score the same
+NUMERIC_FIELDS = {'GPA', 'IELTS'}
+
+
+def normalize_value(value, numeric=False):
+    """Canonical form of a student field: numbers as floats, missing values as None"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, str):
+        if numeric:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+        # Other strings are kept verbatim: whitespace and empty strings change the parsing
+        return value
+    return float(value)
+
+
+def estimate_size(obj):
+    """Rough recursive size in bytes of a cached value"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(estimate_size(item) for item in obj)
+    return size
+
+
+class RankingCache:
+    """
+    Bounded LRU cache of ranking results keyed by normalized student profile.
+
+    Keys are a hash of the scoring-relevant student fields plus the catalog
+    version, so byte-identical resubmissions of the same form are served from
+    memory. When a different catalog version is seen the cache is cleared,
+    which invalidates every entry as soon as the catalog is reloaded.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024, key_fields=None):
+        """
+        Args:
+            max_entries: Maximum number of cached results
+            max_bytes: Approximate memory bound for all cached results
+            key_fields: Student fields used in the cache key (default: SCORING_FIELDS)
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.key_fields = key_fields or SCORING_FIELDS
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._total_bytes = 0
+        self._catalog_version = None
+        self._lock = threading.Lock()
+
+    def key(self, student_data):
+        """Canonical hash of the scoring-relevant fields of a student profile"""
+        profile = [normalize_value(student_data.get(field), field in NUMERIC_FIELDS) for field in self.key_fields]
+        return hashlib.sha1(json.dumps(profile).encode('utf-8')).hexdigest()
+
+    def _check_catalog_version(self, catalog_version):
+        if catalog_version != self._catalog_version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._sizes.clear()
+            self._total_bytes = 0
+            self._catalog_version = catalog_version
+
+    def get(self, student_data, catalog_version):
+        """
+        Look up the cached result for a student profile
+
+        Args:
+            student_data: Dictionary containing student data
+            catalog_version: Version of the university catalog in use
+
+        Returns:
+            result: The cached result, or None on a miss
+        """
+        key = self.key(student_data)
+        with self._lock:
+            self._check_catalog_version(catalog_version)
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, student_data, catalog_version, result):
+        """Store the result for a student profile, evicting least recently used entries"""
+        key = self.key(student_data)
+        size = estimate_size(result)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._check_catalog_version(catalog_version)
+            if key in self._entries:
+                self._total_bytes -= self._sizes.pop(key)
+                del self._entries[key]
+
+            self._entries[key] = result
+            self._sizes[key] = size
+            self._total_bytes += size
+
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._total_bytes -= self._sizes.pop(evicted_key)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached result"""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+    def __len__(self):
+        return len(self._entries)
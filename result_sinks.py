@@ -0,0 +1,259 @@
+import json
+import os
+import zlib
+
+import pandas as pd
+
+# Parquet output is used for the columnar sink when PyArrow is installed
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+from match_explanation import render_explanation
+
+# Columns of the columnar sink: one row per (student, ranked university)
+COLUMNAR_FIELDS = ['row', 'name', 'email', 'gpa', 'ielts', 'position', 'university', 'rank', 'explanation']
+
+
+def student_record(student):
+    """Student fields included with every result"""
+    return {
+        'name': f"{student['First Name']} {student['Last Name']}",
+        'email': student['Email'],
+        'gpa': student['GPA'],
+        'ielts': student['IELTS']
+    }
+
+
+def report_filename(student):
+    """File name of a student's individual JSON report"""
+    return f"{student['First Name']}_{student['Last Name']}_rankings.json"
+
+
+class ResultSink:
+    """
+    Destination for per-student ranking results.
+
+    Sinks receive students in order through write() and must be closed (or
+    used as a context manager) to flush buffered output.
+    """
+
+    # True if write() calls for different students are independent, so pool
+    # workers can write to their own copy of the sink
+    parallel_safe = False
+
+    # True if a run can continue writing after the state returned by checkpoint()
+    resumable = True
+
+    def write(self, row, student, rankings):
+        """
+        Store the rankings of one student
+
+        Args:
+            row: Position of the student in the student file
+            student: Student row (Series or dictionary)
+            rankings: The student's rankings
+        """
+        raise NotImplementedError
+
+    def checkpoint(self):
+        """Flush buffered output and return the state needed to resume writing after it"""
+        return None
+
+    def close(self):
+        """Flush and release the output"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class PerStudentJSONSink(ResultSink):
+    """
+    One indented JSON report per student, the original output layout
+
+    With shards > 0 the reports are spread over shard_NNN subdirectories
+    (chosen from a hash of the file name) to keep directories small.
+    Students sharing a name still overwrite each other's report.
+    """
+
+    parallel_safe = True
+
+    def __init__(self, output_dir, shards=0):
+        """
+        Args:
+            output_dir: Directory for the reports
+            shards: Number of subdirectories to spread reports over (0 for a flat directory)
+        """
+        self.output_dir = output_dir
+        self.shards = shards
+
+    def path_for(self, student):
+        """Path of a student's report"""
+        filename = report_filename(student)
+        if not self.shards:
+            return f"{self.output_dir}/{filename}"
+        shard = zlib.crc32(filename.encode('utf-8')) % self.shards
+        shard_dir = f"{self.output_dir}/shard_{shard:03d}"
+        os.makedirs(shard_dir, exist_ok=True)
+        return f"{shard_dir}/{filename}"
+
+    def write(self, row, student, rankings):
+        with open(self.path_for(student), 'w') as f:
+            json.dump({
+                'student': student_record(student),
+                'rankings': rankings
+            }, f, indent=4, default=render_explanation)
+
+
+class JSONLinesSink(ResultSink):
+    """
+    All results in one newline-delimited JSON file, one line per student
+
+    Each line is {"row": ..., "student": {...}, "rankings": [...]}; the row
+    number keeps students with the same name apart.
+    """
+
+    def __init__(self, path, resume_state=None):
+        """
+        Args:
+            path: Output .jsonl file
+            resume_state: State from checkpoint(); lines written after it are discarded
+        """
+        self.path = path
+        if resume_state is None:
+            self._file = open(path, 'wb')
+        else:
+            self._file = open(path, 'r+b')
+            self._file.truncate(resume_state['offset'])
+            self._file.seek(resume_state['offset'])
+
+    def write(self, row, student, rankings):
+        line = json.dumps({
+            'row': int(row),
+            'student': student_record(student),
+            'rankings': rankings
+        }, default=render_explanation)
+        self._file.write(line.encode('utf-8') + b'\n')
+
+    def checkpoint(self):
+        self._file.flush()
+        return {'offset': self._file.tell()}
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class ColumnarSink(ResultSink):
+    """
+    All results in one table with a row per (student, ranked university)
+
+    Written as Parquet when PyArrow is installed, otherwise as CSV. Rows are
+    buffered and flushed every batch_size rows. Parquet files cannot be
+    reopened for appending, so only the CSV form can resume from a checkpoint.
+    """
+
+    resumable = not PYARROW_AVAILABLE
+
+    def __init__(self, path, batch_size=50000, resume_state=None):
+        """
+        Args:
+            path: Output file; the extension is replaced by .parquet or .csv
+            batch_size: Number of rows buffered before each write
+            resume_state: State from checkpoint() (CSV only); rows written after it are discarded
+        """
+        base, _ = os.path.splitext(path)
+        self.path = base + ('.parquet' if PYARROW_AVAILABLE else '.csv')
+        self.batch_size = batch_size
+        self._columns = {field: [] for field in COLUMNAR_FIELDS}
+        self._num_buffered = 0
+        self._writer = None
+        self._wrote_header = False
+
+        if not PYARROW_AVAILABLE:
+            print("PyArrow not installed. Writing columnar results as CSV. To install, run: pip install pyarrow")
+            if resume_state is not None and resume_state['size'] > 0:
+                with open(self.path, 'r+b') as f:
+                    f.truncate(resume_state['size'])
+                self._wrote_header = True
+
+    def write(self, row, student, rankings):
+        record = student_record(student)
+        for position, ranking in enumerate(rankings, start=1):
+            explanation = ranking['explanation']
+            self._columns['row'].append(int(row))
+            self._columns['name'].append(record['name'])
+            self._columns['email'].append(record['email'])
+            self._columns['gpa'].append(float(record['gpa']))
+            self._columns['ielts'].append(float(record['ielts']))
+            self._columns['position'].append(position)
+            self._columns['university'].append(ranking['university'])
+            self._columns['rank'].append(int(ranking['rank']))
+            self._columns['explanation'].append(None if explanation is None else str(explanation))
+            self._num_buffered += 1
+
+        if self._num_buffered >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows"""
+        if not self._num_buffered:
+            return
+
+        if PYARROW_AVAILABLE:
+            table = pa.Table.from_pydict(self._columns)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            pd.DataFrame(self._columns, columns=COLUMNAR_FIELDS).to_csv(
+                self.path, mode='a' if self._wrote_header else 'w', header=not self._wrote_header, index=False
+            )
+            self._wrote_header = True
+
+        self._columns = {field: [] for field in COLUMNAR_FIELDS}
+        self._num_buffered = 0
+
+    def checkpoint(self):
+        self.flush()
+        if not self.resumable:
+            return None
+        return {'size': os.path.getsize(self.path) if self._wrote_header else 0}
+
+    def close(self):
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+# Sink names accepted by batch_processor --sink
+SINK_TYPES = ['json', 'jsonl', 'columnar']
+
+
+def create_sink(sink_type, output_dir, shards=0, resume_state=None):
+    """
+    Create a result sink writing into output_dir
+
+    Args:
+        sink_type: One of SINK_TYPES
+        output_dir: Directory for the results
+        shards: Subdirectory count for the per-student JSON sink
+        resume_state: State from the sink's checkpoint() to continue writing after
+
+    Returns:
+        sink: The ResultSink
+    """
+    if sink_type == 'json':
+        return PerStudentJSONSink(output_dir, shards)
+    if sink_type == 'jsonl':
+        return JSONLinesSink(f"{output_dir}/rankings.jsonl", resume_state)
+    if sink_type == 'columnar':
+        return ColumnarSink(f"{output_dir}/rankings.parquet", resume_state=resume_state)
+    raise ValueError(f"Unknown result sink: {sink_type}")
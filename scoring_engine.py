@@ -0,0 +1,502 @@
+import time
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+
+# Sparse course incidence matrices are used when SciPy is installed
+try:
+    from scipy import sparse
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+from match_explanation import MatchExplanation, finalize_explanations
+from student_features import CREDIT_TRANSFER_FIELDS, StudentFeatureStore
+
+COMPONENTS = ['gpa', 'ielts', 'extracurriculars', 'credit_transfer']
+
+# Requirement columns and the score component each one feeds
+COLUMN_COMPONENTS = {
+    'Min GPA': 'gpa',
+    'Min IELTS': 'ielts',
+    'Required Extracurriculars': 'extracurriculars',
+    'Engineering Credit Transfer': 'credit_transfer',
+    'Science Credit Transfer': 'credit_transfer',
+    'Business Credit Transfer': 'credit_transfer',
+    'Additional Requirements': None  # Only used in the explanation text
+}
+
+
+def diff_catalogs(old_universities_df, new_universities_df):
+    """
+    Compare two university requirement tables by university and column
+
+    Args:
+        old_universities_df: Requirements the stored results were scored with
+        new_universities_df: Updated requirements
+
+    Returns:
+        changes: Dictionary mapping row position to the set of changed columns
+            (appended universities map to every column), or None if universities
+            were removed, renamed or reordered and positions cannot be patched
+    """
+    old_names = old_universities_df['University Name'].tolist()
+    new_names = new_universities_df['University Name'].tolist()
+    if new_names[:len(old_names)] != old_names:
+        return None
+
+    changes = {}
+    for column in COLUMN_COMPONENTS:
+        old_values = old_universities_df[column].tolist()
+        new_values = new_universities_df[column].tolist()
+        for position, (old_value, new_value) in enumerate(zip(old_values, new_values)):
+            if not (old_value == new_value or (pd.isna(old_value) and pd.isna(new_value))):
+                changes.setdefault(position, set()).add(column)
+
+    for position in range(len(old_names), len(new_names)):
+        changes[position] = set(COLUMN_COMPONENTS)
+
+    return changes
+
+
+class BatchScoringEngine:
+    """
+    Scores a whole students x universities matrix at once with NumPy arrays.
+
+    Produces exactly the same component scores, weighted scores and ranks as
+    UniversityMatcher.calculate_university_match, without the per-pair Python
+    overhead. The matcher's parsing helpers and field weights are reused so the
+    two paths cannot drift apart.
+    """
+
+    def __init__(self, matcher):
+        """
+        Initialize the engine from a matcher
+
+        Args:
+            matcher: UniversityMatcher providing universities_df, catalog,
+                course_vocabulary, student_features, field_weights and the
+                explain_match helper
+        """
+        self.matcher = matcher
+        self.field_weights = matcher.field_weights
+        self.vocabulary = matcher.course_vocabulary
+        self.universities_df = matcher.universities_df
+        self.catalog = matcher.catalog
+
+        # Cohort score arrays, computed on first query
+        self._cohort_components = None
+        self._cohort_scores = None
+        self._component_tensor = None
+
+        self._load_catalog()
+
+    def _load_catalog(self):
+        """Build the per-university requirement arrays from universities_df"""
+        universities = self.universities_df
+
+        # Rows that the catalog resolves their name to (duplicate names are skipped in queries)
+        self.catalog_rows = np.array([
+            self.catalog.position(name) == i for i, name in enumerate(universities['University Name'])
+        ], dtype=bool)
+
+        self.min_gpa = universities['Min GPA'].astype(float).to_numpy()
+        self.min_ielts = universities['Min IELTS'].astype(float).to_numpy()
+        self.required_extracurriculars = universities['Required Extracurriculars'].astype(int).to_numpy()
+
+        # Course incidence matrices (universities x vocabulary), one per field.
+        # Student courses interned after this point, and the placeholder IDs of
+        # courses no university offers, cannot overlap and are simply ignored.
+        university_courses = {}
+        for field in CREDIT_TRANSFER_FIELDS:
+            university_courses[field] = [
+                set(self.vocabulary.intern_all(self.matcher.parse_credit_transfers(courses)))
+                for courses in universities[field]
+            ]
+        self.num_course_columns = len(self.vocabulary)
+
+        self.course_incidence = {}
+        self.has_courses = {}
+        for field in CREDIT_TRANSFER_FIELDS:
+            counts = [len(course_ids) for course_ids in university_courses[field]]
+            self.course_incidence[field] = self._incidence_matrix(
+                np.repeat(np.arange(len(universities)), counts),
+                np.array([c for course_ids in university_courses[field] for c in course_ids], dtype=np.int64),
+                len(universities)
+            )
+            self.has_courses[field] = np.array(counts) > 0
+
+    def _incidence_matrix(self, rows, columns, num_rows):
+        """0/1 matrix with ones at (rows, columns): CSR if SciPy is available, dense otherwise"""
+        shape = (num_rows, self.num_course_columns)
+        if SCIPY_AVAILABLE:
+            data = np.ones(len(rows), dtype=np.float64)
+            return sparse.csr_matrix((data, (rows, columns)), shape=shape)
+
+        incidence = np.zeros(shape, dtype=np.float64)
+        incidence[rows, columns] = 1.0
+        return incidence
+
+    def features_for(self, students_df):
+        """Return the StudentFeatureStore for a students dataframe, parsing it only if needed"""
+        if students_df is self.matcher.students_df:
+            return self.matcher.student_features
+        return StudentFeatureStore(students_df, self.vocabulary)
+
+    def student_course_incidence(self, features):
+        """(students x courses) 0/1 matrix of each student's credit transfer courses"""
+        rows = np.repeat(np.arange(len(features)), features.num_courses)
+        columns = features.course_ids
+        known = (columns >= 0) & (columns < self.num_course_columns)
+        return self._incidence_matrix(rows[known], columns[known], len(features))
+
+    @staticmethod
+    def _threshold_score(student_values, minimums):
+        """Vectorized form of the meets/below-minimum scoring rule"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = student_values[:, None] / minimums[None, :]
+        return np.where(
+            student_values[:, None] >= minimums[None, :],
+            np.minimum(1.0, ratio),
+            np.maximum(0, 0.7 * ratio)
+        )
+
+    def _component_scores(self, features, component, positions):
+        """(students x len(positions)) scores of one component for the given university rows"""
+        if component == 'gpa':
+            return self._threshold_score(features.gpa, self.min_gpa[positions])
+        if component == 'ielts':
+            return self._threshold_score(features.ielts, self.min_ielts[positions])
+        if component == 'extracurriculars':
+            return self._threshold_score(
+                features.num_extracurriculars.astype(np.float64),
+                self.required_extracurriculars[positions].astype(np.float64)
+            )
+
+        # Course overlap for every pair is one incidence matrix product per field:
+        # (students in field x courses) @ (courses x universities)
+        credit_transfer_scores = np.zeros((len(features), len(positions)), dtype=np.float64)
+        course_incidence = self.student_course_incidence(features)
+        num_courses = features.num_courses.astype(np.float64)
+        for f, field in enumerate(CREDIT_TRANSFER_FIELDS):
+            rows = np.flatnonzero(features.field_index == f)
+            if len(rows) == 0:
+                continue
+            overlap = course_incidence[rows] @ self.course_incidence[field][positions].T
+            if SCIPY_AVAILABLE:
+                overlap = overlap.toarray()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scores = np.minimum(1.0, overlap / num_courses[rows][:, None])
+            valid = features.has_courses[rows][:, None] & self.has_courses[field][positions][None, :]
+            credit_transfer_scores[rows] = np.where(valid, scores, 0.0)
+        return credit_transfer_scores
+
+    def score_components(self, features, positions=None, components=COMPONENTS):
+        """
+        Compute component scores for every student/university pair
+
+        Args:
+            features: StudentFeatureStore of the students to score
+            positions: Row positions of the universities to score (default: all)
+            components: Component names to compute (default: all four)
+
+        Returns:
+            components: Dictionary mapping component name to a
+                (students x universities) float64 array
+        """
+        if positions is None:
+            positions = np.arange(len(self.universities_df))
+        return {
+            component: self._component_scores(features, component, positions)
+            for component in components
+        }
+
+    def weighted_scores(self, components):
+        """Combine component scores with the matcher's field weights"""
+        # Same operation order as the scalar path so results are bit-identical
+        return (
+            self.field_weights['gpa'] * components['gpa'] +
+            self.field_weights['ielts'] * components['ielts'] +
+            self.field_weights['extracurriculars'] * components['extracurriculars'] +
+            self.field_weights['credit_transfer'] * components['credit_transfer']
+        )
+
+    @staticmethod
+    def to_ranks(scores):
+        """Convert 0-1 scores to integer 0-10 ranks (round half to even, like round())"""
+        return np.rint(scores * 10).astype(np.int64)
+
+    def score_matrix(self, students_df):
+        """Weighted match scores, shape (students x universities)"""
+        components = self.score_components(self.features_for(students_df))
+        return self.weighted_scores(components)
+
+    def rank_matrix(self, students_df):
+        """Integer 0-10 ranks, shape (students x universities)"""
+        return self.to_ranks(self.score_matrix(students_df))
+
+    def generate_rankings(self, students_df, features=None, lazy_explanations=False, explain_top_k=None):
+        """
+        Generate the Top 10 rankings for every student in one pass
+
+        Args:
+            students_df: DataFrame of students
+            features: StudentFeatureStore for students_df (optional)
+            lazy_explanations: Return MatchExplanation handles instead of strings
+            explain_top_k: Only produce explanations for each student's K best rankings
+
+        Returns:
+            all_rankings: List (one per student, in order) of ranking lists in
+                the same format as UniversityMatcher.generate_ranking
+        """
+        if features is None:
+            features = self.features_for(students_df)
+        components = self.score_components(features)
+        ranks = self.to_ranks(self.weighted_scores(components))
+
+        return self._build_rankings(students_df['Top 10'].tolist(), range(len(students_df)),
+                                    components, features, ranks, lazy_explanations, explain_top_k)
+
+    def stream_rankings(self, student_chunks, lazy_explanations=False, explain_top_k=None, timer=None):
+        """
+        Generate rankings for an iterable of student dataframes, one chunk at a time
+
+        Args:
+            student_chunks: Iterable of student DataFrames (e.g. pd.read_csv(..., chunksize=n))
+            lazy_explanations: Return MatchExplanation handles instead of strings
+            explain_top_k: Only produce explanations for each student's K best rankings
+            timer: StageTimer recording the load, parse and score stages (optional;
+                nothing is timed without one)
+
+        Yields:
+            (student, rankings): Student row (Series) and its ranking list
+        """
+        def stage(name, items):
+            return timer.stage(name, items) if timer is not None else nullcontext()
+
+        student_chunks = iter(student_chunks)
+        while True:
+            start = time.perf_counter()
+            students_df = next(student_chunks, None)
+            if students_df is None:
+                return
+            if timer is not None:
+                timer.record('load', time.perf_counter() - start, len(students_df))
+
+            with stage('parse', len(students_df)):
+                features = self.features_for(students_df)
+            with stage('score', len(students_df)):
+                all_rankings = self.generate_rankings(students_df, features=features, lazy_explanations=lazy_explanations,
+                                                      explain_top_k=explain_top_k)
+            for (_, student), rankings in zip(students_df.iterrows(), all_rankings):
+                yield student, rankings
+
+    def _build_rankings(self, top_10_lists, rows, components, features, ranks, lazy_explanations, explain_top_k):
+        """Assemble sorted ranking lists for the given Top 10 strings and score-array rows"""
+        all_rankings = []
+        for s, top_10 in zip(rows, top_10_lists):
+            rankings = []
+            for uni_name in top_10.split(', '):
+                u = self.catalog.position(uni_name)
+                if u is None:
+                    rankings.append({
+                        'university': uni_name,
+                        'rank': 0,
+                        'explanation': "University requirements data not available."
+                    })
+                    continue
+
+                rankings.append({
+                    'university': uni_name,
+                    'rank': int(ranks[s, u]),
+                    'explanation': MatchExplanation(
+                        self.explanation_text, (components, features, s, u), self.pair_components(components, s, u)
+                    )
+                })
+
+            rankings = sorted(rankings, key=lambda x: x['rank'], reverse=True)
+            all_rankings.append(finalize_explanations(rankings, lazy_explanations, explain_top_k))
+
+        return all_rankings
+
+    @staticmethod
+    def pair_components(components, s, u):
+        """Component scores of student row s and university column u as Python floats"""
+        return {name: float(components[name][s, u]) for name in COMPONENTS}
+
+    def explain_pair(self, components, features, s, u):
+        """Build the explanations dictionary for student row s and university column u"""
+        return self.matcher.explain_match(
+            float(features.gpa[s]), float(self.min_gpa[u]),
+            float(features.ielts[s]), float(self.min_ielts[u]),
+            int(features.num_extracurriculars[s]), int(self.required_extracurriculars[u]),
+            float(components['credit_transfer'][s, u]),
+            CREDIT_TRANSFER_FIELDS[features.field_index[s]],
+            self.universities_df['Additional Requirements'].iat[u]
+        )
+
+    def explanation_text(self, components, features, s, u):
+        """Render the overall explanation text for student row s and university column u"""
+        return " ".join(self.explain_pair(components, features, s, u).values())
+
+    def cohort_scores(self):
+        """
+        Component and weighted scores of the loaded cohort against the whole catalog
+
+        Computed once and reused by the top-K queries.
+
+        Returns:
+            components: Dictionary of (students x universities) component arrays
+            scores: (students x universities) weighted scores
+        """
+        if self._cohort_scores is None:
+            self._cohort_components = self.score_components(self.matcher.student_features)
+            self._cohort_scores = self.weighted_scores(self._cohort_components)
+        return self._cohort_components, self._cohort_scores
+
+    def component_tensor(self):
+        """
+        Component scores of the loaded cohort stacked into one float32 tensor
+
+        Built once from the cohort score arrays and reused by weight sweeps.
+
+        Returns:
+            tensor: (students x universities x 4) float32 array, components in
+                COMPONENTS order
+        """
+        if self._component_tensor is None:
+            components, _ = self.cohort_scores()
+            self._component_tensor = np.stack(
+                [components[component].astype(np.float32) for component in COMPONENTS], axis=-1
+            )
+        return self._component_tensor
+
+    @staticmethod
+    def weight_matrix(weight_sets):
+        """
+        Stack weighting schemes into a (configurations x 4) float32 matrix
+
+        Args:
+            weight_sets: List of weight dictionaries keyed like field_weights,
+                or anything array-like of shape (configurations x 4)
+
+        Returns:
+            weights: (configurations x 4) float32 array in COMPONENTS order
+        """
+        weight_sets = list(weight_sets)
+        if weight_sets and isinstance(weight_sets[0], dict):
+            weight_sets = [[weights[component] for component in COMPONENTS] for weights in weight_sets]
+        weights = np.asarray(weight_sets, dtype=np.float32)
+        if weights.ndim != 2 or weights.shape[1] != len(COMPONENTS):
+            raise ValueError(f"Expected weights of shape (configurations x {len(COMPONENTS)}), got {weights.shape}")
+        return weights
+
+    def weight_sweep(self, weight_sets):
+        """
+        Rank the loaded cohort under many weighting schemes at once
+
+        All schemes are applied to the stored component tensor as a single
+        matrix product, so no pair is rescored. Scores are float32, so a rank
+        that falls exactly on a .5 boundary can differ from the float64 path.
+
+        Args:
+            weight_sets: Weighting schemes (see weight_matrix)
+
+        Returns:
+            ranks: (configurations x students x universities) integer 0-10 ranks
+        """
+        weights = self.weight_matrix(weight_sets)
+        scores = self.component_tensor() @ weights.T
+        return self.to_ranks(np.moveaxis(scores, -1, 0))
+
+    @staticmethod
+    def top_k_indices(scores, k):
+        """
+        Indices of the k largest scores, best first, ties broken by lower index
+
+        Uses a partial selection (np.partition) so only the k candidates are sorted.
+        """
+        num_scores = len(scores)
+        if k <= 0 or num_scores == 0:
+            return np.array([], dtype=np.int64)
+        if k >= num_scores:
+            candidates = np.arange(num_scores)
+        else:
+            kth_largest = np.partition(scores, num_scores - k)[num_scores - k]
+            candidates = np.flatnonzero(scores >= kth_largest)
+        order = np.lexsort((candidates, -scores[candidates]))
+        return candidates[order[:k]]
+
+    def top_universities(self, student_index=None, student_data=None, k=10, lazy_explanations=False):
+        """
+        Score a student against the entire catalog and return the K best universities
+
+        Args:
+            student_index: Index of the student in the loaded dataframe
+            student_data: Dictionary containing student data (if providing new data)
+            k: Number of universities to return
+            lazy_explanations: Return MatchExplanation handles instead of strings
+
+        Returns:
+            rankings: Up to k dictionaries with university, rank, score and explanation,
+                best first
+        """
+        if student_index is not None and student_data is None:
+            components, scores = self.cohort_scores()
+            features = self.matcher.student_features
+            row = student_index
+        elif student_data is not None:
+            features = StudentFeatureStore.from_records([student_data], self.vocabulary)
+            components = self.score_components(features)
+            scores = self.weighted_scores(components)
+            row = 0
+        else:
+            raise ValueError("Either student_index or student_data must be provided")
+
+        student_scores = np.where(self.catalog_rows, scores[row], -np.inf)
+        top = self.top_k_indices(student_scores, min(k, int(self.catalog_rows.sum())))
+
+        rankings = []
+        for u in top:
+            rankings.append({
+                'university': self.universities_df['University Name'].iat[u],
+                'rank': int(self.to_ranks(scores[row, u])),
+                'score': float(scores[row, u]),
+                'explanation': MatchExplanation(
+                    self.explanation_text, (components, features, row, u), self.pair_components(components, row, u)
+                )
+            })
+
+        return finalize_explanations(rankings, lazy_explanations)
+
+    def top_students(self, uni_name, k=10):
+        """
+        Return the K students of the loaded cohort that best match a university
+
+        Args:
+            uni_name: University name as listed in the requirements catalog
+            k: Number of students to return
+
+        Returns:
+            students: Up to k dictionaries with student_index, name, rank and score,
+                best first
+        """
+        u = self.catalog.position(uni_name)
+        if u is None:
+            raise ValueError(f"University not found in requirements catalog: {uni_name}")
+
+        _, scores = self.cohort_scores()
+        university_scores = scores[:, u]
+        students_df = self.matcher.students_df
+
+        students = []
+        for s in self.top_k_indices(university_scores, k):
+            students.append({
+                'student_index': int(s),
+                'name': f"{students_df['First Name'].iat[s]} {students_df['Last Name'].iat[s]}",
+                'rank': int(self.to_ranks(university_scores[s])),
+                'score': float(university_scores[s])
+            })
+
+        return students
@@ -0,0 +1,240 @@
+import re
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+CREDIT_TRANSFER_FIELDS = [
+    'Engineering Credit Transfer',
+    'Science Credit Transfer',
+    'Business Credit Transfer'
+]
+
+# Scoring-relevant features of a single student, parsed once
+StudentFeatures = namedtuple('StudentFeatures', [
+    'gpa',                    # float
+    'ielts',                  # float
+    'num_extracurriculars',   # int
+    'field',                  # credit transfer column, e.g. 'Science Credit Transfer'
+    'course_ids',             # tuple of unique interned course IDs
+    'has_courses'             # False when the credit transfer column is empty/NaN
+])
+
+ACTIVITY_DETAIL = re.compile(r' -> \(.*$')
+TRAILING_ACTIVITY_DETAIL = re.compile(r' -> \(.*\)$')
+
+
+def parse_extracurriculars(extracurriculars_str):
+    """Parse the extracurriculars string into a list of activities"""
+    if pd.isna(extracurriculars_str):
+        return []
+
+    activities = extracurriculars_str.split('), ')
+    activities = [a.strip() for a in activities]
+    activities = [ACTIVITY_DETAIL.sub('', a) for a in activities]
+
+    # Clean up the last item which might have a trailing parenthesis
+    if activities and activities[-1].endswith(')'):
+        activities[-1] = TRAILING_ACTIVITY_DETAIL.sub('', activities[-1])
+
+    return activities
+
+
+def parse_credit_transfers(credit_transfer_str):
+    """Parse the credit transfer string into a list of course codes"""
+    if pd.isna(credit_transfer_str):
+        return []
+
+    courses = credit_transfer_str.split(', ')
+    courses = [c.strip() for c in courses]
+    return courses
+
+
+def detect_field(extracurriculars_str):
+    """Detect the student's credit transfer field from their extracurriculars"""
+    # Simple field detection - could be enhanced with NLP
+    extracurriculars_text = extracurriculars_str.lower() if not pd.isna(extracurriculars_str) else ""
+
+    if any(keyword in extracurriculars_text for keyword in ['engineering', 'robot', 'design', 'tech']):
+        return 'Engineering Credit Transfer'
+    elif any(keyword in extracurriculars_text for keyword in ['science', 'biology', 'chemistry', 'physics', 'lab']):
+        return 'Science Credit Transfer'
+    else:
+        return 'Business Credit Transfer'
+
+
+class CourseVocabulary:
+    """Interns course codes (e.g. 'MATH 14100') as dense integer IDs"""
+
+    def __init__(self):
+        self.codes = []
+        self._ids = {}
+        # Matchers score universities from several threads; new IDs are assigned under the lock
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def intern(self, code):
+        """Return the ID for a course code, assigning a new one if unseen"""
+        course_id = self._ids.get(code)
+        if course_id is None:
+            with self._lock:
+                course_id = self._ids.get(code)
+                if course_id is None:
+                    course_id = len(self.codes)
+                    self.codes.append(code)
+                    self._ids[code] = course_id
+        return course_id
+
+    def intern_all(self, codes):
+        """Intern a list of course codes, returning their IDs in order"""
+        return [self.intern(code) for code in codes]
+
+    def lookup(self, code):
+        """Return the ID for a course code, or None if it was never interned"""
+        return self._ids.get(code)
+
+    def __len__(self):
+        return len(self.codes)
+
+
+def intern_catalog_courses(universities_df, vocabulary):
+    """Intern every credit transfer course offered in a university requirements dataframe"""
+    for field in CREDIT_TRANSFER_FIELDS:
+        for courses in universities_df[field]:
+            vocabulary.intern_all(parse_credit_transfers(courses))
+
+
+def student_course_ids(courses, vocabulary, intern=False):
+    """
+    IDs of a student's unique credit transfer courses
+
+    Only the loaded cohort is interned. For other students (e.g. API requests)
+    the vocabulary is not grown: a code it does not know is offered by no
+    university, so it gets a placeholder ID -1, -2, ... that still counts
+    towards the student's courses but never overlaps.
+
+    Args:
+        courses: List of course codes
+        vocabulary: CourseVocabulary holding the catalog's courses
+        intern: Assign new IDs to unknown codes instead of placeholders
+
+    Returns:
+        course_ids: List of IDs, one per unique code, in order
+    """
+    course_ids = []
+    unknown = 0
+    for code in dict.fromkeys(courses):
+        course_id = vocabulary.intern(code) if intern else vocabulary.lookup(code)
+        if course_id is None:
+            unknown += 1
+            course_id = -unknown
+        course_ids.append(course_id)
+    return course_ids
+
+
+def extract_student_features(student, vocabulary, intern=False):
+    """
+    Parse the scoring-relevant fields of a single student
+
+    Args:
+        student: Dictionary (or Series) containing student data
+        vocabulary: CourseVocabulary holding the catalog's credit transfer courses
+        intern: Intern the student's unknown courses (see student_course_ids)
+
+    Returns:
+        features: StudentFeatures for the student
+    """
+    extracurriculars = student['Extra Co-Curriculars']
+    courses = parse_credit_transfers(student['Credit Transfer Requirement'])
+
+    return StudentFeatures(
+        gpa=float(student['GPA']),
+        ielts=float(student['IELTS']),
+        num_extracurriculars=len(parse_extracurriculars(extracurriculars)),
+        field=detect_field(extracurriculars),
+        course_ids=tuple(student_course_ids(courses, vocabulary, intern)),
+        has_courses=len(courses) > 0
+    )
+
+
+class StudentFeatureStore:
+    """
+    Column store of pre-parsed student features, built once at load time.
+
+    Numeric features live in NumPy arrays and credit transfer courses are kept
+    as interned IDs in a CSR-style layout: the courses of student ``i`` are
+    ``course_ids[course_offsets[i]:course_offsets[i + 1]]``.
+    """
+
+    def __init__(self, students_df, vocabulary=None, intern=False):
+        """
+        Parse every student in the dataframe
+
+        Args:
+            students_df: DataFrame of students
+            vocabulary: CourseVocabulary holding the catalog's courses (a new one
+                is created if not provided)
+            intern: Intern unknown courses, for the cohort a matcher loads; other
+                students get placeholder IDs (see student_course_ids)
+        """
+        self.vocabulary = vocabulary if vocabulary is not None else CourseVocabulary()
+
+        num_students = len(students_df)
+        self.gpa = students_df['GPA'].astype(float).to_numpy()
+        self.ielts = students_df['IELTS'].astype(float).to_numpy()
+        self.num_extracurriculars = np.zeros(num_students, dtype=np.int32)
+        self.field_index = np.zeros(num_students, dtype=np.int8)
+        self.has_courses = np.zeros(num_students, dtype=bool)
+        self.course_offsets = np.zeros(num_students + 1, dtype=np.int64)
+
+        course_ids = []
+        extracurriculars = students_df['Extra Co-Curriculars'].tolist()
+        credit_transfers = students_df['Credit Transfer Requirement'].tolist()
+
+        for i in range(num_students):
+            self.num_extracurriculars[i] = len(parse_extracurriculars(extracurriculars[i]))
+            self.field_index[i] = CREDIT_TRANSFER_FIELDS.index(detect_field(extracurriculars[i]))
+
+            courses = parse_credit_transfers(credit_transfers[i])
+            self.has_courses[i] = len(courses) > 0
+            course_ids.extend(student_course_ids(courses, self.vocabulary, intern))
+            self.course_offsets[i + 1] = len(course_ids)
+
+        self.course_ids = np.array(course_ids, dtype=np.int32)
+
+    @classmethod
+    def from_records(cls, students, vocabulary=None, intern=False):
+        """Build a store from a list of student dictionaries"""
+        return cls(pd.DataFrame(list(students)), vocabulary, intern)
+
+    def __len__(self):
+        return len(self.gpa)
+
+    @property
+    def num_courses(self):
+        """Number of unique credit transfer courses per student"""
+        return np.diff(self.course_offsets)
+
+    def courses(self, i):
+        """Interned course IDs of student i"""
+        return self.course_ids[self.course_offsets[i]:self.course_offsets[i + 1]]
+
+    def row(self, i):
+        """Return the features of student i as a StudentFeatures record"""
+        return StudentFeatures(
+            gpa=float(self.gpa[i]),
+            ielts=float(self.ielts[i]),
+            num_extracurriculars=int(self.num_extracurriculars[i]),
+            field=CREDIT_TRANSFER_FIELDS[self.field_index[i]],
+            course_ids=tuple(self.courses(i).tolist()),
+            has_courses=bool(self.has_courses[i])
+        )
@@ -0,0 +1,141 @@
+import heapq
+from array import array
+from datetime import datetime
+
+import numpy as np
+
+# Rankings at or above this rank are listed as top matches
+TOP_MATCH_RANK = 8
+
+# Number of top matches kept in the summary (the HTML report shows all of them)
+TOP_MATCHES_LIMIT = 20
+
+
+def new_summary(total_students):
+    """Create an empty summary statistics dictionary"""
+    return {
+        'total_students': total_students,
+        'universities': {},
+        'average_rankings': {},
+        'top_matches': [],
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+class SummaryTable:
+    """
+    Columnar table of (student, university, rank) results.
+
+    Rankings are appended as integer codes into compact arrays while students
+    are processed; the summary statistics are then computed in one pass with
+    grouped array aggregation instead of per-ranking dictionary updates.
+    Universities are coded in order of first appearance, which is the order
+    they appear in the summary.
+    """
+
+    def __init__(self):
+        self.student_names = []
+        self.university_names = []
+        self._university_codes = {}
+
+        # One entry per ranking
+        self.student_rows = array('q')
+        self.university_codes = array('q')
+        self.ranks = array('q')
+
+    def __len__(self):
+        return len(self.student_names)
+
+    def university_code(self, uni_name):
+        """Integer code of a university, assigned on first appearance"""
+        code = self._university_codes.get(uni_name)
+        if code is None:
+            code = len(self.university_names)
+            self._university_codes[uni_name] = code
+            self.university_names.append(uni_name)
+        return code
+
+    def add(self, student, rankings):
+        """
+        Append one student's rankings
+
+        Args:
+            student: Student row (Series or dictionary)
+            rankings: The student's rankings (dictionaries with university and rank)
+        """
+        row = len(self.student_names)
+        self.student_names.append(f"{student['First Name']} {student['Last Name']}")
+        for rank_data in rankings:
+            self.student_rows.append(row)
+            self.university_codes.append(self.university_code(rank_data['university']))
+            self.ranks.append(rank_data['rank'])
+
+    def extend(self, other):
+        """Append the results of a later shard of students (e.g. from a pool worker)"""
+        row_offset = len(self.student_names)
+        code_map = np.array([self.university_code(uni_name) for uni_name in other.university_names], dtype=np.int64)
+
+        self.student_names.extend(other.student_names)
+        self.student_rows.extend((np.frombuffer(other.student_rows, dtype=np.int64) + row_offset).tolist())
+        if len(other.university_codes):
+            self.university_codes.extend(code_map[np.frombuffer(other.university_codes, dtype=np.int64)].tolist())
+        self.ranks.extend(other.ranks)
+
+    def top_matches(self, limit=TOP_MATCHES_LIMIT):
+        """
+        The best rankings at or above TOP_MATCH_RANK, best first
+
+        Selected with a bounded heap; ties keep the order the results were added in.
+        """
+        ranks = np.frombuffer(self.ranks, dtype=np.int64)
+        candidates = np.flatnonzero(ranks >= TOP_MATCH_RANK).tolist()
+        best = heapq.nsmallest(limit, candidates, key=lambda i: (-self.ranks[i], i))
+        return [
+            {
+                'student': self.student_names[self.student_rows[i]],
+                'university': self.university_names[self.university_codes[i]],
+                'rank': self.ranks[i]
+            }
+            for i in best
+        ]
+
+    def summary(self, top_matches_limit=TOP_MATCHES_LIMIT):
+        """
+        Aggregate the table into the summary statistics dictionary
+
+        Returns:
+            summary: Dictionary with total_students, per-university totals and
+                student lists (in student order; they are sorted when rendered),
+                average rankings and top matches
+        """
+        summary = new_summary(len(self))
+        num_universities = len(self.university_names)
+        rows = np.frombuffer(self.student_rows, dtype=np.int64)
+        codes = np.frombuffer(self.university_codes, dtype=np.int64)
+        ranks = np.frombuffer(self.ranks, dtype=np.int64)
+
+        totals = np.bincount(codes, minlength=num_universities).tolist()
+        sums = np.bincount(codes, weights=ranks, minlength=num_universities).astype(np.int64).tolist()
+
+        # Rankings grouped by university, keeping student order within each group
+        order = np.argsort(codes, kind='stable')
+        grouped_rows = rows[order].tolist()
+        grouped_ranks = ranks[order].tolist()
+
+        start = 0
+        for code, uni_name in enumerate(self.university_names):
+            end = start + totals[code]
+            summary['universities'][uni_name] = {
+                'total_rankings': totals[code],
+                'sum_rankings': sums[code],
+                'students': [
+                    {'name': self.student_names[row], 'rank': rank}
+                    for row, rank in zip(grouped_rows[start:end], grouped_ranks[start:end])
+                ]
+            }
+            if totals[code] > 0:
+                summary['average_rankings'][uni_name] = round(sums[code] / totals[code], 1)
+            start = end
+
+        summary['top_matches'] = self.top_matches(top_matches_limit)
+        return summary
@@ -0,0 +1,63 @@
+import hashlib
+from types import MappingProxyType
+
+import pandas as pd
+
+
+class UniversityCatalog:
+    """
+    Hashed index of university requirement records keyed by university name.
+
+    Each record is materialized once as a read-only mapping with the same keys
+    and values as ``universities_df[...].iloc[0].to_dict()``, so lookups are
+    O(1) instead of a full column scan per Top 10 choice.
+    """
+
+    def __init__(self, universities_df):
+        """
+        Build the catalog from a university requirements dataframe
+
+        Args:
+            universities_df: DataFrame loaded from university_requirements.csv
+        """
+        self.universities_df = universities_df
+        self.names = tuple(universities_df['University Name'])
+
+        # Content hash identifying this version of the requirements
+        row_hashes = pd.util.hash_pandas_object(universities_df, index=False).to_numpy()
+        self.version = hashlib.sha1(row_hashes.tobytes()).hexdigest()[:16]
+
+        self._records = {}
+        self._positions = {}
+
+        for position, record in enumerate(universities_df.to_dict('records')):
+            name = record['University Name']
+            # First row wins, matching the previous filter + iloc[0] lookup
+            if name not in self._records:
+                self._records[name] = MappingProxyType(record)
+                self._positions[name] = position
+
+    @classmethod
+    def from_csv(cls, university_requirements_path):
+        """Load a catalog from a university requirements CSV file"""
+        return cls(pd.read_csv(university_requirements_path))
+
+    def get(self, uni_name, default=None):
+        """Return the requirements record for a university, or default if unknown"""
+        return self._records.get(uni_name, default)
+
+    def position(self, uni_name):
+        """Return the row position of a university in universities_df, or None if unknown"""
+        return self._positions.get(uni_name)
+
+    def __contains__(self, uni_name):
+        return uni_name in self._records
+
+    def __getitem__(self, uni_name):
+        return self._records[uni_name]
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
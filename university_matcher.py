@@ -1,43 +1,53 @@
 import pandas as pd
 import numpy as np
-import re
 from fuzzywuzzy import fuzz
 import json
+from scoring_engine import BatchScoringEngine
+from student_features import (
+    CourseVocabulary, StudentFeatureStore, extract_student_features,
+    parse_extracurriculars, parse_credit_transfers, detect_field
+)
+from dataset_registry import registry
+from match_explanation import MatchExplanation, finalize_explanations
+from result_cache import RankingCache
 
 class UniversityMatcher:
-    def __init__(self, student_data_path, university_requirements_path):
-        self.students_df = pd.read_csv(student_data_path)
-        self.universities_df = pd.read_csv(university_requirements_path)
+    def __init__(self, student_data_path, university_requirements_path, load_students=True):
+        """
+        Args:
+            student_data_path: Path to the student CSV file
+            university_requirements_path: Path to the university requirements CSV file
+            load_students: Load the whole student file into memory. Set to False for
+                streaming runs (see stream_rankings) where only the header is read.
+        
+        Both files are taken from the process-wide dataset registry, so matchers
+        built from the same files share one copy of the data.
+        """
+        self.student_data_path = student_data_path
+        if load_students:
+            self.students_df = registry.read_csv(student_data_path)
+        else:
+            self.students_df = pd.read_csv(student_data_path, nrows=0)
+        self.catalog = registry.catalog(university_requirements_path)
+        self.universities_df = self.catalog.universities_df.copy(deep=False)
+        self.course_vocabulary = CourseVocabulary()
+        self.student_features = StudentFeatureStore(self.students_df, self.course_vocabulary, intern=True)
         self.field_weights = {
             'gpa': 0.3,
             'ielts': 0.2,
             'extracurriculars': 0.2,
             'credit_transfer': 0.3
         }
+        self.scoring_engine = BatchScoringEngine(self)
+        self.result_cache = RankingCache()
         
     def parse_extracurriculars(self, extracurriculars_str):
         """Parse the extracurriculars string into a list of activities"""
-        if pd.isna(extracurriculars_str):
-            return []
-        
-        activities = extracurriculars_str.split('), ')
-        activities = [a.strip() for a in activities]
-        activities = [re.sub(r' -> \(.*$', '', a) for a in activities]
-        
-        # Clean up the last item which might have a trailing parenthesis
-        if activities and activities[-1].endswith(')'):
-            activities[-1] = re.sub(r' -> \(.*\)$', '', activities[-1])
-            
-        return activities
+        return parse_extracurriculars(extracurriculars_str)
     
     def parse_credit_transfers(self, credit_transfer_str):
         """Parse the credit transfer string into a list of course codes"""
-        if pd.isna(credit_transfer_str):
-            return []
-            
-        courses = credit_transfer_str.split(', ')
-        courses = [c.strip() for c in courses]
-        return courses
+        return parse_credit_transfers(credit_transfer_str)
         
     def calculate_credit_transfer_score(self, student_courses, university_courses):
         """Calculate the credit transfer score based on course overlap"""
@@ -57,35 +67,35 @@ class UniversityMatcher:
             
         return min(1.0, overlap / len(student_course_set))
     
-    def calculate_university_match(self, student, university):
+    def detect_field(self, extracurriculars_str):
+        """Detect the student's credit transfer field from their extracurriculars"""
+        return detect_field(extracurriculars_str)
+    
+    def explain_match(self, student_gpa, min_gpa, student_ielts, min_ielts, num_extracurriculars,
+                      required_extracurriculars, credit_transfer_score, field, additional_requirements):
         """
-        Calculate the match score between a student and a university
+        Build the explanation for each component of a student/university match
         
         Args:
-            student: Dictionary containing student data
-            university: Dictionary containing university requirements
+            student_gpa, min_gpa: Student GPA and university minimum
+            student_ielts, min_ielts: Student IELTS score and university minimum
+            num_extracurriculars, required_extracurriculars: Activity count and university minimum
+            credit_transfer_score: Credit transfer component score between 0 and 1
+            field: Credit transfer column used for the student (e.g. 'Science Credit Transfer')
+            additional_requirements: University additional requirements (may be NaN)
             
         Returns:
-            score: Float between 0 and 1 representing match quality
-            explanation: Dictionary with explanations for each component
+            explanations: Dictionary with explanations for each component
         """
         explanations = {}
         
         # GPA comparison
-        gpa_score = 0
-        student_gpa = float(student['GPA'])
-        min_gpa = float(university['Min GPA'])
-        
         if student_gpa >= min_gpa:
-            # If GPA meets or exceeds requirement, scale score based on how much it exceeds
-            gpa_score = min(1.0, student_gpa / min_gpa)
             if student_gpa > min_gpa + 0.5:
                 explanations['gpa'] = f"Your GPA of {student_gpa} significantly exceeds the minimum requirement of {min_gpa}."
             else:
                 explanations['gpa'] = f"Your GPA of {student_gpa} meets the minimum requirement of {min_gpa}."
         else:
-            # If GPA is below requirement, scale score based on how close it is
-            gpa_score = max(0, 0.7 * (student_gpa / min_gpa))
             deficit = min_gpa - student_gpa
             if deficit > 0.5:
                 explanations['gpa'] = f"Your GPA of {student_gpa} is significantly below the minimum requirement of {min_gpa}."
@@ -93,20 +103,12 @@ class UniversityMatcher:
                 explanations['gpa'] = f"Your GPA of {student_gpa} is slightly below the minimum requirement of {min_gpa}."
         
         # IELTS comparison
-        ielts_score = 0
-        student_ielts = float(student['IELTS'])
-        min_ielts = float(university['Min IELTS'])
-        
         if student_ielts >= min_ielts:
-            # If IELTS meets or exceeds requirement, scale score based on how much it exceeds
-            ielts_score = min(1.0, student_ielts / min_ielts)
             if student_ielts > min_ielts + 1:
                 explanations['ielts'] = f"Your IELTS score of {student_ielts} significantly exceeds the minimum requirement of {min_ielts}."
             else:
                 explanations['ielts'] = f"Your IELTS score of {student_ielts} meets the minimum requirement of {min_ielts}."
         else:
-            # If IELTS is below requirement, scale score based on how close it is
-            ielts_score = max(0, 0.7 * (student_ielts / min_ielts))
             deficit = min_ielts - student_ielts
             if deficit > 0.5:
                 explanations['ielts'] = f"Your IELTS score of {student_ielts} is below the minimum requirement of {min_ielts}."
@@ -114,37 +116,15 @@ class UniversityMatcher:
                 explanations['ielts'] = f"Your IELTS score of {student_ielts} is slightly below the minimum requirement of {min_ielts}."
         
         # Extracurriculars comparison
-        extracurriculars_score = 0
-        student_extracurriculars = self.parse_extracurriculars(student['Extra Co-Curriculars'])
-        required_extracurriculars = int(university['Required Extracurriculars'])
-        
-        if len(student_extracurriculars) >= required_extracurriculars:
-            extracurriculars_score = min(1.0, len(student_extracurriculars) / required_extracurriculars)
-            if len(student_extracurriculars) > required_extracurriculars + 1:
-                explanations['extracurriculars'] = f"Your {len(student_extracurriculars)} extracurricular activities exceed the minimum requirement of {required_extracurriculars}."
+        if num_extracurriculars >= required_extracurriculars:
+            if num_extracurriculars > required_extracurriculars + 1:
+                explanations['extracurriculars'] = f"Your {num_extracurriculars} extracurricular activities exceed the minimum requirement of {required_extracurriculars}."
             else:
-                explanations['extracurriculars'] = f"Your {len(student_extracurriculars)} extracurricular activities meet the minimum requirement of {required_extracurriculars}."
+                explanations['extracurriculars'] = f"Your {num_extracurriculars} extracurricular activities meet the minimum requirement of {required_extracurriculars}."
         else:
-            extracurriculars_score = max(0, 0.7 * (len(student_extracurriculars) / required_extracurriculars))
-            explanations['extracurriculars'] = f"You have {len(student_extracurriculars)} extracurricular activities, which is below the minimum requirement of {required_extracurriculars}."
+            explanations['extracurriculars'] = f"You have {num_extracurriculars} extracurricular activities, which is below the minimum requirement of {required_extracurriculars}."
         
         # Credit transfer comparison
-        # Determine which field to use based on a simple keyword analysis of extracurriculars
-        student_courses = self.parse_credit_transfers(student['Credit Transfer Requirement'])
-        
-        # Simple field detection - could be enhanced with NLP
-        extracurriculars_text = student['Extra Co-Curriculars'].lower() if not pd.isna(student['Extra Co-Curriculars']) else ""
-        
-        if any(keyword in extracurriculars_text for keyword in ['engineering', 'robot', 'design', 'tech']):
-            field = 'Engineering Credit Transfer'
-        elif any(keyword in extracurriculars_text for keyword in ['science', 'biology', 'chemistry', 'physics', 'lab']):
-            field = 'Science Credit Transfer'
-        else:
-            field = 'Business Credit Transfer'
-        
-        university_courses = self.parse_credit_transfers(university[field])
-        credit_transfer_score = self.calculate_credit_transfer_score(student_courses, university_courses)
-        
         if credit_transfer_score > 0.8:
             explanations['credit_transfer'] = f"Excellent credit transfer potential for your courses in the {field.split(' ')[0]} field."
         elif credit_transfer_score > 0.5:
@@ -154,35 +134,140 @@ class UniversityMatcher:
         else:
             explanations['credit_transfer'] = f"Very limited credit transfer potential for your courses in the {field.split(' ')[0]} field."
         
-        # Calculate weighted score
-        weighted_score = (
-            self.field_weights['gpa'] * gpa_score +
-            self.field_weights['ielts'] * ielts_score +
-            self.field_weights['extracurriculars'] * extracurriculars_score +
-            self.field_weights['credit_transfer'] * credit_transfer_score
+        # Add additional requirements context
+        if not pd.isna(additional_requirements):
+            explanations['additional'] = f"Note: {additional_requirements}"
+        
+        return explanations
+    
+    def calculate_component_scores(self, university, features):
+        """
+        Calculate the numeric component scores between a student and a university
+        
+        Args:
+            university: Dictionary containing university requirements
+            features: Pre-parsed StudentFeatures for the student
+            
+        Returns:
+            components: Dictionary with a score between 0 and 1 for each component
+        """
+        # GPA comparison
+        gpa_score = 0
+        student_gpa = features.gpa
+        min_gpa = float(university['Min GPA'])
+        
+        if student_gpa >= min_gpa:
+            # If GPA meets or exceeds requirement, scale score based on how much it exceeds
+            gpa_score = min(1.0, student_gpa / min_gpa)
+        else:
+            # If GPA is below requirement, scale score based on how close it is
+            gpa_score = max(0, 0.7 * (student_gpa / min_gpa))
+        
+        # IELTS comparison
+        ielts_score = 0
+        student_ielts = features.ielts
+        min_ielts = float(university['Min IELTS'])
+        
+        if student_ielts >= min_ielts:
+            # If IELTS meets or exceeds requirement, scale score based on how much it exceeds
+            ielts_score = min(1.0, student_ielts / min_ielts)
+        else:
+            # If IELTS is below requirement, scale score based on how close it is
+            ielts_score = max(0, 0.7 * (student_ielts / min_ielts))
+        
+        # Extracurriculars comparison
+        extracurriculars_score = 0
+        num_extracurriculars = features.num_extracurriculars
+        required_extracurriculars = int(university['Required Extracurriculars'])
+        
+        if num_extracurriculars >= required_extracurriculars:
+            extracurriculars_score = min(1.0, num_extracurriculars / required_extracurriculars)
+        else:
+            extracurriculars_score = max(0, 0.7 * (num_extracurriculars / required_extracurriculars))
+        
+        # Credit transfer comparison
+        # The field is determined by a simple keyword analysis of extracurriculars
+        credit_transfer_score = 0
+        if features.has_courses:
+            university_courses = self.course_vocabulary.intern_all(self.parse_credit_transfers(university[features.field]))
+            credit_transfer_score = self.calculate_credit_transfer_score(features.course_ids, university_courses)
+        
+        return {
+            'gpa': gpa_score,
+            'ielts': ielts_score,
+            'extracurriculars': extracurriculars_score,
+            'credit_transfer': credit_transfer_score
+        }
+    
+    def weighted_score(self, components):
+        """Combine component scores into a single score between 0 and 1"""
+        return (
+            self.field_weights['gpa'] * components['gpa'] +
+            self.field_weights['ielts'] * components['ielts'] +
+            self.field_weights['extracurriculars'] * components['extracurriculars'] +
+            self.field_weights['credit_transfer'] * components['credit_transfer']
         )
+    
+    def explain_components(self, university, features, components):
+        """Build the explanations dictionary for already-computed component scores"""
+        return self.explain_match(
+            features.gpa, float(university['Min GPA']),
+            features.ielts, float(university['Min IELTS']),
+            features.num_extracurriculars, int(university['Required Extracurriculars']),
+            components['credit_transfer'], features.field,
+            university['Additional Requirements']
+        )
+    
+    def explanation_text(self, university, features, components):
+        """Render the overall explanation text for a match"""
+        return " ".join(self.explain_components(university, features, components).values())
+    
+    def calculate_university_match(self, student, university, features=None):
+        """
+        Calculate the match score between a student and a university
         
-        # Add additional requirements context
-        if not pd.isna(university['Additional Requirements']):
-            explanations['additional'] = f"Note: {university['Additional Requirements']}"
+        Args:
+            student: Dictionary containing student data
+            university: Dictionary containing university requirements
+            features: Pre-parsed StudentFeatures for the student (optional)
+            
+        Returns:
+            score: Float between 0 and 1 representing match quality
+            explanation: Dictionary with explanations for each component
+        """
+        if features is None:
+            features = extract_student_features(student, self.course_vocabulary)
+        
+        components = self.calculate_component_scores(university, features)
+        
+        # Calculate weighted score
+        weighted_score = self.weighted_score(components)
+        
+        explanations = self.explain_components(university, features, components)
         
         return weighted_score, explanations
     
-    def generate_ranking(self, student_index=None, student_data=None):
+    def generate_ranking(self, student_index=None, student_data=None, lazy_explanations=False, explain_top_k=None):
         """
         Generate university rankings for a student
         
         Args:
             student_index: Index of the student in the dataframe (if using existing data)
             student_data: Dictionary containing student data (if providing new data)
+            lazy_explanations: Return MatchExplanation handles (with numeric component
+                scores) instead of rendering every explanation string
+            explain_top_k: Only produce explanations for the K best-ranked universities
             
         Returns:
             rankings: List of dictionaries with university rankings and explanations
         """
         if student_data is None and student_index is not None:
             student_data = self.students_df.iloc[student_index].to_dict()
+            features = self.student_features.row(student_index)
         elif student_data is None:
             raise ValueError("Either student_index or student_data must be provided")
+        else:
+            features = extract_student_features(student_data, self.course_vocabulary)
         
         # Extract student's top 10 universities
         top_10_universities = student_data['Top 10'].split(', ')
@@ -190,10 +275,10 @@ class UniversityMatcher:
         rankings = []
         
         for uni_name in top_10_universities:
-            # Find the university in the requirements dataframe
-            uni_data = self.universities_df[self.universities_df['University Name'] == uni_name]
+            # Find the university in the requirements catalog
+            uni_requirements = self.catalog.get(uni_name)
             
-            if len(uni_data) == 0:
+            if uni_requirements is None:
                 # University not found in requirements database
                 rankings.append({
                     'university': uni_name,
@@ -202,41 +287,140 @@ class UniversityMatcher:
                 })
                 continue
             
-            uni_requirements = uni_data.iloc[0].to_dict()
-            
-            # Calculate match score and get explanations
-            score, explanations = self.calculate_university_match(student_data, uni_requirements)
+            # Calculate match score; the explanation is only rendered when needed
+            components = self.calculate_component_scores(uni_requirements, features)
+            score = self.weighted_score(components)
             
             # Convert score to 0-10 scale and round to nearest integer
             rank = round(score * 10)
             
-            # Generate overall explanation
-            overall_explanation = []
-            for key, explanation in explanations.items():
-                overall_explanation.append(explanation)
-            
             rankings.append({
                 'university': uni_name,
                 'rank': rank,
-                'explanation': " ".join(overall_explanation)
+                'explanation': MatchExplanation(
+                    self.explanation_text, (uni_requirements, features, components), components
+                )
             })
         
         # Sort rankings by rank in descending order
         rankings = sorted(rankings, key=lambda x: x['rank'], reverse=True)
         
-        return rankings
+        return finalize_explanations(rankings, lazy_explanations, explain_top_k)
 
-    def evaluate_new_student(self, student_data):
+    def evaluate_new_student(self, student_data, lazy_explanations=False, explain_top_k=None):
         """
         Evaluate a new student against all universities
         
         Args:
             student_data: Dictionary containing student data
+            lazy_explanations: Return MatchExplanation handles instead of strings
+            explain_top_k: Only produce explanations for the K best-ranked universities
             
         Returns:
             rankings: List of dictionaries with university rankings and explanations
         """
-        return self.generate_ranking(student_data=student_data)
+        if lazy_explanations or explain_top_k is not None:
+            return self.generate_ranking(student_data=student_data, lazy_explanations=lazy_explanations,
+                                         explain_top_k=explain_top_k)
+        
+        # Resubmitted profiles are served from the cache until the catalog changes
+        rankings = self.result_cache.get(student_data, self.catalog.version)
+        if rankings is None:
+            rankings = self.generate_ranking(student_data=student_data)
+            self.result_cache.put(student_data, self.catalog.version, rankings)
+        return [dict(ranking) for ranking in rankings]
+    
+    def generate_all_rankings(self, students_df=None, lazy_explanations=False, explain_top_k=None):
+        """
+        Generate university rankings for a whole cohort in one vectorized pass
+        
+        Args:
+            students_df: DataFrame of students (defaults to the loaded student data)
+            lazy_explanations: Return MatchExplanation handles instead of strings
+            explain_top_k: Only produce explanations for the K best-ranked universities
+            
+        Returns:
+            all_rankings: List of rankings (one per student, in dataframe order),
+                identical to calling generate_ranking for each student
+        """
+        if students_df is None:
+            students_df = self.students_df
+        return self.scoring_engine.generate_rankings(students_df, lazy_explanations=lazy_explanations,
+                                                     explain_top_k=explain_top_k)
+    
+    def stream_rankings(self, student_data_path=None, chunk_size=10000, lazy_explanations=False,
+                        explain_top_k=None, skip_students=0, timer=None):
+        """
+        Rank a student file chunk by chunk without loading it into memory
+        
+        Each chunk of chunk_size rows is read, scored against the in-memory
+        catalog and released before the next one, so peak memory depends on
+        the chunk size rather than the number of students.
+        
+        Args:
+            student_data_path: Student CSV file (default: the file given to the constructor)
+            chunk_size: Number of student rows scored at a time
+            lazy_explanations: Return MatchExplanation handles instead of strings
+            explain_top_k: Only produce explanations for each student's K best rankings
+            skip_students: Number of students at the start of the file to skip (e.g. when
+                resuming); row numbers of the yielded students still count them
+            timer: StageTimer recording the load, parse and score stages (optional)
+            
+        Yields:
+            (student, rankings): The student row and its rankings, in file order
+        """
+        if student_data_path is None:
+            student_data_path = self.student_data_path
+        # Fixed numeric dtypes so a chunk of whole-number grades parses like the full file
+        chunks = pd.read_csv(student_data_path, chunksize=chunk_size, dtype={'GPA': float, 'IELTS': float},
+                             skiprows=range(1, skip_students + 1))
+        if skip_students:
+            chunks = (chunk.set_axis(chunk.index + skip_students) for chunk in chunks)
+        return self.scoring_engine.stream_rankings(chunks, lazy_explanations=lazy_explanations,
+                                                   explain_top_k=explain_top_k, timer=timer)
+    
+    def recommend_universities(self, student_index=None, student_data=None, k=10, lazy_explanations=False):
+        """
+        Recommend the K best universities from the whole requirements catalog
+        
+        Unlike generate_ranking, this is not limited to the student's Top 10 choices.
+        
+        Args:
+            student_index: Index of the student in the dataframe (if using existing data)
+            student_data: Dictionary containing student data (if providing new data)
+            k: Number of universities to return
+            lazy_explanations: Return MatchExplanation handles instead of strings
+            
+        Returns:
+            rankings: List of dictionaries with university, rank, score and explanation
+        """
+        return self.scoring_engine.top_universities(student_index, student_data, k, lazy_explanations)
+    
+    def best_students_for_university(self, uni_name, k=10):
+        """
+        Find the K students in the dataset that best match a university
+        
+        Args:
+            uni_name: University name as listed in university_requirements.csv
+            k: Number of students to return
+            
+        Returns:
+            students: List of dictionaries with student_index, name, rank and score
+        """
+        return self.scoring_engine.top_students(uni_name, k)
+    
+    def compare_weightings(self, weight_sets):
+        """
+        Rank every student against every university under several weighting schemes
+        
+        Args:
+            weight_sets: List of weight dictionaries with the same keys as field_weights
+            
+        Returns:
+            ranks: Array of shape (schemes x students x universities) with 0-10 ranks,
+                universities in universities_df row order
+        """
+        return self.scoring_engine.weight_sweep(weight_sets)
 
 
 def main():